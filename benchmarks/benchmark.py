@@ -0,0 +1,187 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from argparse import ArgumentParser
+from collections import OrderedDict
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+repo_root_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(repo_root_path, 'enhancitizer'))
+
+from bank.bank import ReportsBank
+from enhancitizer import Enhancitizer
+from utils.options import Options
+
+from generator import TSanLogGenerator
+
+class Benchmark(object):
+    """Times the extraction, the collection, every task and whole runs of the enhancitizer on generated logs"""
+
+    __version = 1
+
+    def __init__(self, work_dir_path, enhancitizer_args):
+        self.__work_dir_path = work_dir_path
+        self.__enhancitizer_args = enhancitizer_args
+
+    def run(self, sizes):
+        results = OrderedDict([
+            ('version', self.__version),
+            ('python', platform.python_version()),
+            ('machine', platform.machine()),
+            ('enhancitizer_args', self.__enhancitizer_args),
+            ('sizes', OrderedDict())
+        ])
+        for size in sizes:
+            print('benchmarking ' + str(size) + ' reports ...')
+            results['sizes'][str(size)] = self.__run_size(size)
+        return results
+
+    def __run_size(self, size):
+        dir_path = os.path.join(self.__work_dir_path, str(size))
+        project_root_path, logs_dir_path = self.__generate(dir_path, TSanLogGenerator(reports=size))
+        output_root_path = os.path.join(dir_path, 'output')
+        timings = OrderedDict()
+
+        # extract_reports: only the extraction of all logfiles into an empty output folder
+        options = self.__options(project_root_path, output_root_path, logs_dir_path)
+        with self.__quiet():
+            bank = ReportsBank(options)
+            bank.collect_reports()
+            start = time.perf_counter()
+            for path in options.logfiles_paths:
+                bank.extract_reports(path)
+            timings['extract_reports'] = time.perf_counter() - start
+            bank.save_index()
+
+        # collect_reports: restore the reports that have just been extracted
+        options = self.__options(project_root_path, output_root_path, logs_dir_path, clean=False)
+        with self.__quiet():
+            start = time.perf_counter()
+            ReportsBank(options).collect_reports()
+            timings['collect_reports'] = time.perf_counter() - start
+
+        # the whole run; the metrics of the run contain the timings of every task
+        options = self.__options(project_root_path, output_root_path, logs_dir_path)
+        with self.__quiet():
+            start = time.perf_counter()
+            Enhancitizer(options).run()
+            timings['run'] = time.perf_counter() - start
+        with open(os.path.join(output_root_path, 'metrics.json'), 'r') as metrics_file:
+            metrics = json.load(metrics_file)
+            metrics_file.close()
+        for measurement in metrics['measurements']:
+            if measurement['kind'] == 'task':
+                timings['task: ' + measurement['name']] = measurement['wall_time_s']
+        timings['peak_rss_kb'] = metrics['peak_rss_kb']
+        return OrderedDict((name, round(value, 6)) for name, value in timings.items())
+
+    def __generate(self, dir_path, generator):
+        """Generates the logs only once for every set of settings"""
+        settings_file_path = os.path.join(dir_path, 'settings.json')
+        project_root_path = os.path.join(dir_path, 'project')
+        logs_dir_path = os.path.join(dir_path, 'logs')
+        if os.path.isfile(settings_file_path):
+            with open(settings_file_path, 'r') as settings_file:
+                settings = json.load(settings_file)
+                settings_file.close()
+            if settings == generator.settings:
+                return project_root_path, logs_dir_path
+        if os.path.isdir(dir_path):
+            shutil.rmtree(dir_path)
+        print('  generating the logs ...')
+        project_root_path, logs_dir_path = generator.generate(dir_path)
+        with open(settings_file_path, 'w') as settings_file:
+            json.dump(generator.settings, settings_file)
+            settings_file.close()
+        return project_root_path, logs_dir_path
+
+    def __options(self, project_root_path, output_root_path, logs_dir_path, clean=True):
+        argv = sys.argv
+        sys.argv = ['enhancitizer', '--minimal'] + (['--clean'] if clean else []) + self.__enhancitizer_args + \
+            [project_root_path, output_root_path, logs_dir_path]
+        try:
+            return Options().collect()
+        finally:
+            sys.argv = argv
+
+    @contextlib.contextmanager
+    def __quiet(self):
+        """The output of the enhancitizer is not part of the benchmark"""
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+def compare(results, baseline, tolerance):
+    """Prints the results next to the baseline; returns the amount of regressions"""
+    regressions = 0
+    for size, timings in results['sizes'].items():
+        baseline_timings = baseline.get('sizes', {}).get(size, {})
+        print('\n' + size + ' reports:')
+        for name, value in timings.items():
+            line = '  ' + name.ljust(48) + str(value).rjust(14)
+            baseline_value = baseline_timings.get(name)
+            if baseline_value:
+                ratio = value / baseline_value
+                line += str(baseline_value).rjust(14) + ('x' + str(round(ratio, 2))).rjust(8)
+                if ratio > 1 + tolerance:
+                    line += '  REGRESSION'
+                    regressions += 1
+            print(line)
+    return regressions
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmark the enhancitizer with generated TSan logs.')
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000',
+                        help='comma separated amounts of reports (default: 1000,10000,100000,1000000)')
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'enhancitizer-benchmarks'),
+                        help='where the logs are generated and the enhancitizer writes its output')
+    parser.add_argument('--enhancitizer-args', default='',
+                        help='additional options for every run, e.g. "-j 4 --pipeline"')
+    parser.add_argument('--results', default=None,
+                        help='where the results are saved (default: WORK-DIR/results.json)')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                           'baseline.json'),
+                        help='results of a previous run to compare with (default: benchmarks/baseline.json)')
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='slowdown that counts as a regression (default: 0.2 = 20 percent)')
+    args = parser.parse_args()
+    work_dir_path = os.path.abspath(args.work_dir)
+    os.makedirs(work_dir_path, exist_ok=True)
+    # mind: the enhancitizer expects to be run from the root of the repository
+    os.chdir(repo_root_path)
+    results = Benchmark(work_dir_path, args.enhancitizer_args.split()).run(
+        [int(size) for size in args.sizes.split(',')])
+    results_file_path = args.results or os.path.join(work_dir_path, 'results.json')
+    with open(results_file_path, 'w') as results_file:
+        json.dump(results, results_file, indent=2)
+        results_file.close()
+    print('results: ' + results_file_path)
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+            baseline_file.close()
+    elif not args.update_baseline:
+        print('no baseline to compare with (' + args.baseline + '); create it with --update-baseline')
+    regressions = compare(results, baseline, args.tolerance)
+    if args.update_baseline:
+        shutil.copyfile(results_file_path, args.baseline)
+        print('\nupdated the baseline: ' + args.baseline)
+    elif regressions > 0:
+        print('\n' + str(regressions) + ' regression(s)')
+        sys.exit(1)
@@ -0,0 +1,171 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from argparse import ArgumentParser
+import os
+import random
+import re
+
+class TSanLogGenerator(object):
+    """Generates a synthetic C project and TSan logfiles that reference it; the same settings always produce the
+    same files"""
+
+    __project_dir_name = 'project'
+    __logs_dir_name = 'logs'
+    __lines_per_func = 12
+    __funcs_per_file = 50
+    __reports_per_file = 1000 # scales the size of the project with the amount of reports
+    __max_files = 400
+    __max_duplicate_pool = 10000 # reports that can be repeated as duplicates
+    # the frames of the reports contain absolute paths; the enhancitizer only accepts these characters in them
+    __path_pattern = re.compile('^[a-z\\d/\\-\\.]+$', re.IGNORECASE)
+    __dirs = ['mono/metadata', 'mono/mini', 'mono/utils', 'mono/sgen', 'mono/io-layer']
+    __noise = [
+        'Running test {}',
+        'PASS: {}',
+        'ok {} - completed in 0.01 s',
+        'mono-test: assembly loaded ({})'
+    ]
+
+    def __init__(self, reports=1000, duplicate_ratio=0.3, stack_depth=8, thread_leak_ratio=0.1, noise_lines=3,
+                 logfiles=4, seed=1):
+        self.reports = reports
+        self.duplicate_ratio = duplicate_ratio
+        self.stack_depth = stack_depth
+        self.thread_leak_ratio = thread_leak_ratio
+        self.noise_lines = noise_lines
+        self.logfiles = logfiles
+        self.seed = seed
+
+    @property
+    def settings(self):
+        return {
+            'reports': self.reports,
+            'duplicate_ratio': self.duplicate_ratio,
+            'stack_depth': self.stack_depth,
+            'thread_leak_ratio': self.thread_leak_ratio,
+            'noise_lines': self.noise_lines,
+            'logfiles': self.logfiles,
+            'seed': self.seed
+        }
+
+    def generate(self, dir_path):
+        """Writes DIR/project and DIR/logs; returns both paths"""
+        rand = random.Random(self.seed)
+        project_root_path = os.path.join(os.path.abspath(dir_path), self.__project_dir_name)
+        if not self.__path_pattern.search(project_root_path):
+            raise ValueError('the path of the project must only consist of letters, digits, \'/\', \'-\' and \'.\'; ' +
+                             'other characters break the frames of the reports: ' + project_root_path)
+        logs_dir_path = os.path.join(dir_path, self.__logs_dir_name)
+        funcs = self.__generate_project(project_root_path)
+        os.makedirs(logs_dir_path, exist_ok=True)
+        duplicate_pool = []
+        reports_per_logfile = -(-self.reports // self.logfiles)
+        report_no = 0
+        for logfile_no in range(self.logfiles):
+            with open(os.path.join(logs_dir_path, 'tsan-' + str(logfile_no) + '.log'), 'w') as logfile:
+                for i in range(min(reports_per_logfile, self.reports - report_no)):
+                    report_no += 1
+                    for j in range(self.noise_lines):
+                        logfile.write(rand.choice(self.__noise).format(report_no * 100 + j) + '\n')
+                    if duplicate_pool and rand.random() < self.duplicate_ratio:
+                        logfile.write(rand.choice(duplicate_pool))
+                        continue
+                    if rand.random() < self.thread_leak_ratio:
+                        report = self.__thread_leak(rand, funcs)
+                    else:
+                        report = self.__data_race(rand, funcs)
+                    if len(duplicate_pool) < self.__max_duplicate_pool:
+                        duplicate_pool.append(report)
+                    else:
+                        duplicate_pool[rand.randrange(self.__max_duplicate_pool)] = report
+                    logfile.write(report)
+                logfile.close()
+        return project_root_path, logs_dir_path
+
+    def __generate_project(self, project_root_path):
+        """Writes the source files; returns (file_path, func_name, first_body_line_num) of all functions"""
+        funcs = []
+        files_count = min(self.__max_files, max(len(self.__dirs), self.reports // self.__reports_per_file))
+        for file_no in range(files_count):
+            rel_path = os.path.join(self.__dirs[file_no % len(self.__dirs)], 'file-' + str(file_no) + '.c')
+            file_path = os.path.join(project_root_path, rel_path)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            lines = ['#include <stdio.h>', '']
+            for func_no in range(self.__funcs_per_file):
+                func_name = 'file_' + str(file_no) + '_func_' + str(func_no)
+                lines.extend(['static void', func_name + ' (int a,', '\tint b)', '{'])
+                funcs.append((file_path, func_name, len(lines) + 1))
+                for line_no in range(self.__lines_per_func):
+                    lines.append('\tx_' + str(line_no) + ' = a + b + ' + str(line_no) + ';')
+                lines.extend(['}', ''])
+            with open(file_path, 'w') as src_file:
+                src_file.write('\n'.join(lines) + '\n')
+                src_file.close()
+        return funcs
+
+    def __frames(self, rand, funcs, depth, first_no=0):
+        frames = ''
+        for i in range(first_no, first_no + depth):
+            file_path, func_name, line_num = rand.choice(funcs)
+            frames += '    #' + str(i) + ' ' + func_name + ' ' + file_path + ':' + \
+                str(line_num + rand.randrange(self.__lines_per_func)) + ':' + str(rand.randint(3, 20)) + \
+                ' (libmono.so+0x' + format(rand.randrange(1 << 24), 'x') + ')\n'
+        return frames
+
+    def __data_race(self, rand, funcs):
+        address = format(rand.randrange(1 << 40), 'x')
+        report = \
+            '==================\n' + \
+            'WARNING: ThreadSanitizer: data race (pid=' + str(rand.randint(100, 99999)) + ')\n' + \
+            '  ' + rand.choice(['Write', 'Read', 'Atomic write', 'Atomic read']) + ' of size ' + \
+            str(rand.choice([1, 4, 8])) + ' at 0x' + address + ' by thread T' + str(rand.randint(1, 64)) + ':\n' + \
+            self.__frames(rand, funcs, rand.randint(1, self.stack_depth)) + '\n' + \
+            '  Previous ' + rand.choice(['write', 'read']) + ' of size ' + str(rand.choice([1, 4, 8])) + \
+            ' at 0x' + address + ' by main thread:\n' + \
+            self.__frames(rand, funcs, rand.randint(1, self.stack_depth)) + '\n'
+        if rand.random() < 0.2:
+            report += '  Location is global \'g_var_' + str(rand.randrange(100)) + '\' of size 8 at 0x' + address + \
+                ' (libmono.so+0x1)\n\n'
+        report += \
+            '  Thread T1 (tid=' + str(rand.randint(100, 99999)) + ', running) created by main thread at:\n' + \
+            '    #0 pthread_create <null> (libtsan.so.0+0x2bcee)\n' + \
+            self.__frames(rand, funcs, 1, 1) + '\n' + \
+            'SUMMARY: ThreadSanitizer: data race\n' + \
+            '==================\n'
+        return report
+
+    def __thread_leak(self, rand, funcs):
+        return \
+            '==================\n' + \
+            'WARNING: ThreadSanitizer: thread leak (pid=' + str(rand.randint(100, 99999)) + ')\n' + \
+            '  Thread T' + str(rand.randint(1, 64)) + ' (tid=' + str(rand.randint(100, 99999)) + \
+            ', finished) created by main thread at:\n' + \
+            '    #0 pthread_create <null> (libtsan.so.0+0x2bcee)\n' + \
+            self.__frames(rand, funcs, rand.randint(1, self.stack_depth), 1) + '\n' + \
+            'SUMMARY: ThreadSanitizer: thread leak\n' + \
+            '==================\n'
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Generate a synthetic project and TSan logfiles that reference it.')
+    parser.add_argument('--reports', type=int, default=1000)
+    parser.add_argument('--duplicate-ratio', type=float, default=0.3)
+    parser.add_argument('--stack-depth', type=int, default=8)
+    parser.add_argument('--thread-leak-ratio', type=float, default=0.1)
+    parser.add_argument('--noise-lines', type=int, default=3)
+    parser.add_argument('--logfiles', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('dir_path')
+    args = parser.parse_args()
+    project_root_path, logs_dir_path = TSanLogGenerator(
+        args.reports, args.duplicate_ratio, args.stack_depth, args.thread_leak_ratio, args.noise_lines,
+        args.logfiles, args.seed).generate(args.dir_path)
+    print('project: ' + project_root_path)
+    print('logs:    ' + logs_dir_path)
@@ -9,54 +9,292 @@
 # ------------------------------------------------------------------------------
 
 from copy import copy
+import mmap
+from multiprocessing import Pool
 import os
+from threading import RLock
+import weakref
 
+from .cache import CallStacksCache
+from .checkpoints import LogfileCheckpoints
+from .duplication import DuplicateDetector
 from .extraction import TSanReportExtractor
+from .index import ReportsIndex
+import utils.files
+from utils.metrics import WorkerCounters
+from utils.printer import Printer
+
+def _scan_logfile(args):
+    """Scan a part of a logfile in a worker process; see ReportsBank.scan_logfile; the counters of the worker are
+    appended"""
+    options, logfile_path, start, end = args
+    with WorkerCounters() as counters:
+        result = ReportsBank(options).scan_logfile(logfile_path, start, end)
+    return result + (counters.values,)
+
+class ReportsBankCursor(object):
+    """Walks through the reports of a bank; any amount of cursors can be used at the same time"""
+
+    def __init__(self, bank):
+        self.__bank = bank
+        self.__pos = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        # mind: the cache takes care of the memory that is used by call stacks
+        report, self.__pos = self.__bank._report_at(self.__pos)
+        if not report:
+            raise StopIteration
+        return report
 
 class ReportsBank(object):
-    """Extracts reports from a log file and stores objects of ReportsBankReport"""
+    """Extracts reports from a log file and stores objects of Report"""
+
+    __max_removed_ratio = 0.5 # the slots of removed reports are cleaned up beyond this ratio
+    __chunk_size = 64 * 1024 * 1024 # bytes of a logfile that are scanned by a worker at once
 
     def __init__(self, options):
+        self.__options = options
+        self.__printer = Printer(options)
+        self.__lock = RLock()
+        # slots of reports in their order; removed reports leave None behind until the slots are compacted
         self.__reports = []
-        self.__iter_pos = 0
+        # Report.slot
+        self.__slots = {}
+        self.__removed_count = 0
+        self.__cursors = weakref.WeakSet()
+        self.__cache = CallStacksCache(options.stack_cache_mb)
+        self.__detector = None if not options.skip_duplicates else DuplicateDetector()
+        self.__detector_primed = False
         self.__extractors = [
-            TSanReportExtractor(options)
+            TSanReportExtractor(options, self.__cache, self.__detector)
         ]
+        self.__checkpoints = None if not options.incremental else LogfileCheckpoints(options)
+        self.__index = ReportsIndex(options)
 
     def __iter__(self):
-        self.__iter_pos = 0
-        return self
+        return self.cursor()
 
-    def __next__(self):
-        if self.__iter_pos > 1:
-            # don't keep the call stacks; they would waste a huge amount of memory
-            del self.__reports[self.__iter_pos - 1].call_stacks
-        if self.__iter_pos >= len(self.__reports):
-            raise StopIteration
-        else:
-            self.__iter_pos += 1
-            return self.__reports[self.__iter_pos - 1]
+    def __len__(self):
+        return len(self.__slots)
+
+    def cursor(self):
+        """Returns a new, independent cursor"""
+        with self.__lock:
+            if self.__removed_count > len(self.__reports) * self.__max_removed_ratio:
+                self.__compact_slots()
+            cursor = ReportsBankCursor(self)
+            self.__cursors.add(cursor)
+            return cursor
+
+    def _report_at(self, pos):
+        """Returns the next report at or after the slot pos (or None) and the slot after it"""
+        with self.__lock:
+            while pos < len(self.__reports):
+                if self.__reports[pos]:
+                    return self.__reports[pos], pos + 1
+                pos += 1
+            return None, pos
+
+    @property
+    def cache(self):
+        return self.__cache
 
     def collect_reports(self):
         """Collect existing reports from the output folder"""
+        self.__index.load()
         for extractor in self.__extractors:
             extractor.collect()
-            self.__reports.extend(extractor.reports)
+            for report in extractor.reports:
+                self.__index.restore(report)
+                self.__add(report)
+
+    def save_index(self):
+        """Store the parsed data of all reports for the next run"""
+        self.__index.save(self.cursor())
 
     def extract_reports(self, logfile_path):
-        """Extract new reports from the logfile"""
+        """Extract new reports from the logfile; returns the reports that have been added"""
+        self.__prime_detector()
+        offset = self.__logfile_offset(logfile_path)
+        if offset != None:
+            size, consumed, unfinished = self.__read_logfile(logfile_path, offset)
+            self.__warn_unfinished(logfile_path, unfinished)
+            self.__checkpoint(logfile_path, size, consumed)
+        return self.__add_extracted_reports()
+
+    def extract_reports_parallel(self, logfiles_paths, jobs):
+        """Extract new reports from the logfiles with a pool of worker processes"""
+        # the workers only scan parts of the logfiles; storing happens here in the order of the parts which keeps
+        # the numbering of the reports deterministic and only the blocks of a few parts in memory
+        self.__prime_detector()
+        args = []
+        for logfile_path in logfiles_paths:
+            offset = self.__logfile_offset(logfile_path)
+            if offset != None:
+                args.extend([(self.__options, logfile_path, start, end)
+                             for start, end in self.__split_logfile(logfile_path, offset)])
+        with Pool(jobs) as pool:
+            for i, (blocks, size, consumed, unfinished, counters) in enumerate(pool.imap(_scan_logfile, args)):
+                logfile_path = args[i][1]
+                WorkerCounters.merge(counters)
+                for extractor, extractor_blocks in zip(self.__extractors, blocks):
+                    for block in extractor_blocks:
+                        extractor.store_block(*block)
+                self.__warn_unfinished(logfile_path, unfinished)
+                if i + 1 == len(args) or args[i + 1][1] != logfile_path:
+                    # the last part of the logfile
+                    self.__checkpoint(logfile_path, size, consumed)
+        return self.__add_extracted_reports()
+
+    def scan_logfile(self, logfile_path, start=0, end=None):
+        """Only scan the logfile from the byte position start up to end (or the end of the file) and return the
+        blocks of each extractor instead of storing them, followed by the scanned size, the consumed offset and
+        the categories of unfinished blocks that have been flushed"""
+        for extractor in self.__extractors:
+            extractor.defer_blocks()
+        size, consumed, unfinished = self.__read_logfile(logfile_path, start, end)
+        return [extractor.deferred_blocks for extractor in self.__extractors], size, consumed, unfinished
+
+    def __prime_detector(self):
+        """Let the detector know about the reports that are in the bank already (e.g. collected ones)"""
+        if self.__detector and not self.__detector_primed:
+            self.__detector_primed = True
+            for report in self.cursor():
+                sanitizer_name_short = report.sanitizer.name_short
+                category_name = report.category_name
+                if self.__detector.supports(sanitizer_name_short, category_name):
+                    identifiers = self.__detector.identifiers(sanitizer_name_short, category_name, report.call_stacks)
+                    if identifiers:
+                        self.__detector.add(sanitizer_name_short, category_name, identifiers)
+
+    def __logfile_offset(self, logfile_path):
+        """Returns the byte offset to start reading from or None, if there is nothing new"""
+        if not os.path.isfile(logfile_path):
+            # e.g. a logfile that is being rotated while it is followed
+            return None
+        if not self.__checkpoints:
+            return 0
+        if self.__checkpoints.unchanged(logfile_path):
+            return None
+        return self.__checkpoints.offset(logfile_path)
+
+    def __checkpoint(self, logfile_path, size, consumed):
+        if self.__checkpoints:
+            self.__checkpoints.update(logfile_path, size, consumed).save()
+
+    def __split_logfile(self, logfile_path, offset):
+        """Returns (start, end) of the parts of the logfile that can be scanned independently; end is None for
+        the end of the file"""
+        if utils.files.compression(logfile_path):
+            # compressed logfiles can only be read from their beginning
+            return [(offset, None)]
+        parts = []
+        start = offset
+        with open(logfile_path, 'rb') as logfile:
+            size = os.fstat(logfile.fileno()).st_size
+            if size - start > self.__chunk_size:
+                with mmap.mmap(logfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    size = len(data)
+                    while size - start > self.__chunk_size:
+                        boundaries = [extractor.boundary(data, start + self.__chunk_size)
+                                      for extractor in self.__extractors]
+                        # mind: all extractors have to agree on the boundary
+                        if not boundaries[0] or boundaries.count(boundaries[0]) != len(boundaries):
+                            break
+                        end, next_start = boundaries[0]
+                        parts.append((start, end))
+                        start = next_start
+            logfile.close()
+        parts.append((start, size))
+        return parts
+
+    def __read_logfile(self, logfile_path, offset, end=None):
+        """Returns the amount of bytes that have been looked at, the offset up to which they are consumed and the
+        categories of unfinished blocks that have been flushed"""
         # we really only want one walk through large logfiles
-        with open(logfile_path, 'r') as logfile:
-            last_line = ''
-            for line in logfile:
+        compression = utils.files.compression(logfile_path)
+        if compression:
+            # compressed logfiles are decompressed on the fly and never hit the disk; offsets are positions
+            # within the decompressed data
+            size = os.stat(logfile_path).st_size
+            with utils.files.open_compressed(logfile_path, compression) as logfile:
+                logfile.seek(offset)
                 for extractor in self.__extractors:
-                    extractor.extract(last_line, line)
-                last_line = line
-            logfile.close()
-            for extractor in self.__extractors:
-                self.__reports.extend(extractor.reports)
+                    extractor.walk_start(offset)
+                pos = offset
+                for line in logfile:
+                    for extractor in self.__extractors:
+                        extractor.walk(pos, line)
+                    pos += len(line)
+                logfile.close()
+            consumed = min([extractor.walk_end() for extractor in self.__extractors])
+        else:
+            # the extractors jump through the mapped bytes
+            size = 0
+            consumed = offset
+            with open(logfile_path, 'rb') as logfile:
+                size = os.fstat(logfile.fileno()).st_size
+                if size > 0:
+                    with mmap.mmap(logfile.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                        size = len(data) if end == None else min(end, len(data))
+                        if size == len(data):
+                            consumed = min([extractor.extract_blocks(data, offset)
+                                            for extractor in self.__extractors])
+                        else:
+                            # only a part of the logfile; the positions are relative to its start
+                            part = data[offset:size]
+                            consumed = offset + min([extractor.extract_blocks(part)
+                                                     for extractor in self.__extractors])
+                logfile.close()
+        unfinished = []
+        for extractor in self.__extractors:
+            if self.__checkpoints:
+                # unfinished reports are read again next time; they are likely still being written
+                extractor.discard()
+            else:
+                category_name = extractor.flush()
+                if category_name:
+                    unfinished.append(category_name)
+        return size, consumed, unfinished
+
+    def __warn_unfinished(self, logfile_path, unfinished):
+        for category_name in unfinished:
+            self.__printer.task_info(
+                'warning: the last ' + category_name + ' of ' + logfile_path + ' is unfinished; storing it anyway')
+
+    def __add_extracted_reports(self):
+        reports = []
+        for extractor in self.__extractors:
+            reports.extend(extractor.reports)
+        for report in reports:
+            self.__add(report)
+        return reports
+
+    def __add(self, report):
+        with self.__lock:
+            self.__slots[report] = len(self.__reports)
+            self.__reports.append(report)
 
     def remove_report(self, report):
-        """Deletes the report file and removes the report from the bank"""
+        """Deletes the report file and removes the report from the bank; safe while iterating"""
+        context_file_path = report.context_file_path
+        if context_file_path:
+            os.remove(context_file_path)
         os.remove(report.file_path)
-        self.__reports.remove(report)
+        self.__cache.discard(report)
+        with self.__lock:
+            self.__reports[self.__slots.pop(report)] = None
+            self.__removed_count += 1
+            if self.__removed_count > len(self.__reports) * self.__max_removed_ratio:
+                self.__compact_slots()
+
+    def __compact_slots(self):
+        # cursors rely on the slots; they can only be compacted while nobody is walking through the bank
+        if len(self.__cursors) > 0:
+            return
+        self.__reports = [report for report in self.__reports if report]
+        self.__slots = dict((report, slot) for slot, report in enumerate(self.__reports))
+        self.__removed_count = 0
@@ -0,0 +1,71 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from collections import OrderedDict
+import sys
+from threading import RLock
+
+class CallStacksCache(object):
+    """Keeps the call stacks of the least recently used reports within a memory budget"""
+
+    __frame_size = 120 # estimated amount of bytes per ReportCallStackFrame (incl. its numbers)
+
+    def __init__(self, budget_mb):
+        self.__budget = budget_mb * 1024 * 1024
+        self.__lock = RLock() # several cursors of the bank might be used by different threads
+        self.__size = 0
+        # report.size
+        self.__entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def hit(self, report):
+        with self.__lock:
+            self.hits += 1
+            if report in self.__entries:
+                self.__entries.move_to_end(report)
+
+    def miss(self, report, call_stacks):
+        with self.__lock:
+            self.misses += 1
+            self.add(report, call_stacks)
+
+    def add(self, report, call_stacks):
+        size = self.__estimate_size(call_stacks)
+        with self.__lock:
+            self.discard(report)
+            self.__entries[report] = size
+            self.__size += size
+            # the most recent report always stays; it is likely to be used again right away
+            while self.__size > self.__budget and len(self.__entries) > 1:
+                evicted_report, evicted_size = self.__entries.popitem(last=False)
+                self.__size -= evicted_size
+                del evicted_report.call_stacks
+
+    def discard(self, report):
+        with self.__lock:
+            size = self.__entries.pop(report, None)
+            if size:
+                self.__size -= size
+
+    def __estimate_size(self, call_stacks):
+        size = sys.getsizeof(call_stacks)
+        for stack in call_stacks:
+            size += sys.getsizeof(stack) + \
+                sys.getsizeof(stack.title) + \
+                sys.getsizeof(stack.frames) + \
+                sys.getsizeof(stack.special) + \
+                len(stack.frames) * self.__frame_size
+        return size
+
+    def __str__(self):
+        return str(self.hits) + ' hits, ' + \
+            str(self.misses) + ' misses, ' + \
+            str(round(self.__size / 1024 / 1024, 1)) + ' MB in use'
@@ -0,0 +1,79 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+import hashlib
+import json
+import os
+
+class LogfileCheckpoints(object):
+    """Remembers how far logfiles have been consumed; stored in the output folder"""
+
+    __file_name = 'checkpoints.json'
+    __version = 1
+    __fingerprint_size = 4096 # amount of bytes at the start of a logfile that identify it
+
+    def __init__(self, options):
+        self.__file_path = os.path.join(options.output_root_path, self.__file_name)
+        # logfile_path.(inode|size|fingerprint|offset)
+        self.__data = {}
+        if os.path.isfile(self.__file_path):
+            with open(self.__file_path, 'r') as checkpoints_file:
+                try:
+                    data = json.load(checkpoints_file)
+                except ValueError:
+                    data = {}
+                checkpoints_file.close()
+            if data.get('version') == self.__version:
+                self.__data = data.get('logfiles', {})
+
+    def offset(self, logfile_path):
+        """Returns the byte offset to continue from; 0 if the logfile has been replaced or truncated"""
+        checkpoint = self.__valid_checkpoint(logfile_path)
+        return 0 if not checkpoint else checkpoint['offset']
+
+    def unchanged(self, logfile_path):
+        """True, if nothing has been appended to the logfile since the last checkpoint"""
+        checkpoint = self.__valid_checkpoint(logfile_path)
+        return bool(checkpoint) and os.stat(logfile_path).st_size == checkpoint['size']
+
+    def update(self, logfile_path, size, offset):
+        """Remember that the first size bytes of the logfile have been read up to offset"""
+        self.__data[logfile_path] = {
+            'inode': os.stat(logfile_path).st_ino,
+            'size': size,
+            'fingerprint': self.__fingerprint(logfile_path),
+            'offset': offset
+        }
+        return self
+
+    def save(self):
+        buffer_file_path = self.__file_path + '.buffer'
+        with open(buffer_file_path, 'w') as buffer_file:
+            json.dump({ 'version': self.__version, 'logfiles': self.__data }, buffer_file, indent=2, sort_keys=True)
+            buffer_file.close()
+        os.replace(buffer_file_path, self.__file_path)
+        return self
+
+    def __valid_checkpoint(self, logfile_path):
+        checkpoint = self.__data.get(logfile_path)
+        if not checkpoint:
+            return None
+        stat = os.stat(logfile_path)
+        if stat.st_ino != checkpoint['inode'] or \
+           stat.st_size < checkpoint['size'] or \
+           self.__fingerprint(logfile_path) != checkpoint['fingerprint']:
+            return None
+        return checkpoint
+
+    def __fingerprint(self, logfile_path):
+        with open(logfile_path, 'rb') as logfile:
+            fingerprint = hashlib.sha1(logfile.read(self.__fingerprint_size)).hexdigest()
+            logfile.close()
+        return fingerprint
@@ -0,0 +1,81 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+import hashlib
+
+class DuplicateDetector(object):
+    """Derives identifiers from the call stacks of reports and remembers them to detect duplicates"""
+
+    __tsan_data_race_max_stack_frames = 3
+    __digest_size = 16 # bytes per identifier; plenty to avoid collisions
+
+    def __init__(self):
+        self.__identifiers_funcs = {
+            'tsan': {
+                'data race': self.__tsan_data_race_identifiers,
+                'thread leak': self.__tsan_thread_leak_identifiers
+            }
+        }
+        # sanitizer.category.digests
+        self.__known_identifiers = {}
+
+    def supports(self, sanitizer_name_short, category_name):
+        return bool(self.__identifiers_funcs.get(sanitizer_name_short, {}).get(category_name))
+
+    def identifiers(self, sanitizer_name_short, category_name, call_stacks):
+        """Returns a list of identifiers; one of them is enough to identify a duplicate"""
+        return self.__identifiers_funcs[sanitizer_name_short][category_name](call_stacks)
+
+    def add(self, sanitizer_name_short, category_name, identifiers):
+        """Remember the identifiers; returns False (and remembers nothing), if one of them is known already"""
+        known_identifiers = self.__get_known_identifiers(sanitizer_name_short, category_name)
+        digests = [self.__digest(identifier) for identifier in identifiers]
+        for digest in digests:
+            if digest in known_identifiers:
+                return False
+        known_identifiers.update(digests)
+        return True
+
+    def __get_known_identifiers(self, sanitizer_name_short, category_name):
+        if not sanitizer_name_short in self.__known_identifiers:
+            self.__known_identifiers[sanitizer_name_short] = {}
+        if not category_name in self.__known_identifiers[sanitizer_name_short]:
+            self.__known_identifiers[sanitizer_name_short][category_name] = set()
+        return self.__known_identifiers[sanitizer_name_short][category_name]
+
+    def __digest(self, identifier):
+        return hashlib.blake2b(identifier.encode('utf-8'), digest_size=self.__digest_size).digest()
+
+    def __tsan_data_race_identifiers(self, call_stacks):
+        fragments = []
+        for stack in call_stacks:
+            if 'tsan_data_race_type' in stack.special:
+                fragment = [
+                    stack.special.get('tsan_data_race_type'),
+                    stack.special.get('tsan_data_race_bytes')
+                ]
+                for i in range(min(len(stack.frames), self.__tsan_data_race_max_stack_frames)):
+                    fragment.extend([
+                        stack.frames[i].src_file_rel_path,
+                        stack.frames[i].func_name,
+                        stack.frames[i].line_num,
+                        stack.frames[i].char_pos
+                    ])
+                fragments.append(':'.join(['?' if not f else str(f) for f in fragment]))
+        if len(fragments) == 1:
+            return fragments
+        if len(fragments) == 2:
+            # either way is fine!
+            return [fragments[0] + ':' + fragments[1], fragments[1] + ':' + fragments[0]]
+
+    def __tsan_thread_leak_identifiers(self, call_stacks):
+        for stack in call_stacks:
+            if stack.special.get('tsan_thread_leak_thread_name'):
+                return [stack.special['tsan_thread_leak_thread_name']]
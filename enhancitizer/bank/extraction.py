@@ -19,9 +19,12 @@
 #   - int               number
 #   - string            file_path:   get + set only
 #   - string            dir_path:    get only
-#   - ReportCallStack[] call_stacks: get + delete only
+#   - string            context_file_path: get only; None, if there is no sidecar file with context
+#   - ReportCallStack[] call_stacks: get + set + delete only
+#   - bytes             packed:      get + set only; call_stacks and special, compressed JSON
 #   - dictionary        special:
 #                         - string tsan_data_race_global_location
+#                         - int    tsan_data_race_cluster
 #
 # ReportCallStack:
 #   - string                 title
@@ -32,20 +35,32 @@
 #                              - string tsan_thread_leak_thread_name
 #
 # ReportCallStackFrame:
-#   - string func_name
-#   - string src_file_path
-#   - string src_file_rel_path
-#   - string src_file_name
-#   - string src_file_dir_rel_path
-#   - int    line num
-#   - int    char_pos
+#   - string           func_name
+#   - ReportSourceFile src_file
+#   - string           src_file_path:         get only
+#   - string           src_file_rel_path:     get only
+#   - string           src_file_name:         get only
+#   - string           src_file_dir_rel_path: get only
+#   - int              line num
+#   - int              char_pos
+#
+# ReportSourceFile (shared by all frames that point into the same file):
+#   - string path
+#   - string rel_path
+#   - string name
+#   - string dir_rel_path
 #
 # ------------------------------------------------------------------------------
 
+import io
+import json
 import os
 import re
+import sys
+import zlib
 
 import utils.files
+from utils.metrics import Counters
 from utils.printer import Printer
 
 class Sanitizer(object):
@@ -62,11 +77,13 @@ class Sanitizer(object):
 class Report(object):
     """A trade-off between memory consumption and file interactions"""
 
-    def __init__(self, options, is_new, sanitizer, category_name, number, file_path):
+    def __init__(self, options, is_new, sanitizer, category_name, number, file_path, cache=None):
         self.__options = options
+        self.__cache = cache # keeps the call stacks of all reports within a memory budget
         self.__dir_path = None # special setter
         self.__file_path = None # special setter
         self.__call_stacks = None # lazy initialisation
+        self.__packed = None # lazy initialisation
         self.is_new = bool(is_new)
         self.sanitizer = sanitizer
         self.category_name = category_name
@@ -87,16 +104,55 @@ class Report(object):
         self.__file_path = file_path
         self.__dir_path = None if not file_path else os.path.dirname(file_path)
 
+    @property
+    def context_file_path(self):
+        context_file_path = utils.files.context_file_path(self.file_path)
+        return context_file_path if os.path.isfile(context_file_path) else None
+
     @property
     def call_stacks(self):
-        if not self.__call_stacks:
-            self.__call_stacks = ReportCallStackExtractor(self.__options).extract(self).call_stacks
-        return self.__call_stacks
+        # mind: other threads might evict the call stacks at any time; only the local reference is safe
+        call_stacks = self.__call_stacks
+        if call_stacks is None:
+            if self.__packed is not None:
+                packed_call_stacks, special = json.loads(zlib.decompress(self.__packed).decode())
+                call_stacks = [ReportCallStack.unpack(self.__options, stack) for stack in packed_call_stacks]
+            else:
+                extractor = ReportCallStackExtractor(self.__options).extract(self)
+                call_stacks, special = extractor.call_stacks, extractor.special
+            self.special.update(special)
+            self.__call_stacks = call_stacks
+            if self.__cache:
+                self.__cache.miss(self, call_stacks)
+        elif self.__cache:
+            self.__cache.hit(self)
+        return call_stacks
+
+    @call_stacks.setter
+    def call_stacks(self, call_stacks):
+        self.__call_stacks = call_stacks
+        if self.__cache:
+            self.__cache.add(self, call_stacks)
 
     @call_stacks.deleter
     def call_stacks(self):
+        if self.__cache:
+            self.__cache.discard(self)
         self.__call_stacks = None
 
+    @property
+    def packed(self):
+        """Compact version of the parsed data which is a lot cheaper to keep than the call stacks themselves; only
+        plain data (JSON), since it is stored in the output folder as well"""
+        if self.__packed is None:
+            self.__packed = zlib.compress(json.dumps(
+                [[stack.pack() for stack in self.call_stacks], self.special], separators=(',', ':')).encode())
+        return self.__packed
+
+    @packed.setter
+    def packed(self, packed):
+        self.__packed = packed
+
     def __str__(self):
         """Quickly show the type of the report; should be used in user context"""
         return self.category_name + ' #' + str(self.number) + ' (' + self.sanitizer.name + ')'
@@ -116,29 +172,108 @@ class Report(object):
 class ReportCallStack(object):
     """A call stack"""
 
+    __slots__ = ('title', 'frames', 'special')
+
     def __init__(self, title):
         self.title = title
         self.frames = []
         self.special = {}
 
+    def pack(self):
+        """Returns the call stack as plain data"""
+        return [self.title, [frame.pack() for frame in self.frames], self.special]
+
+    @classmethod
+    def unpack(cls, options, packed):
+        title, frames, special = packed
+        stack = cls(title)
+        stack.frames = [ReportCallStackFrame(options, *frame) for frame in frames]
+        stack.special = special
+        return stack
+
     def __repr__(self):
         return 'ReportCallStack { ' + \
             'title: ' + repr(self.title) + ', ' + \
             'frames: ' + repr(self.frames) + ', ' + \
             'special: ' + repr(self.special) + ' }'
 
+class ReportSourceFile(object):
+    """The paths of a source file; there is only one object per file which is shared by all frames"""
+
+    __slots__ = ('path', 'rel_path', 'name', 'dir_rel_path')
+
+    # path.ReportSourceFile
+    __source_files = {}
+
+    def __init__(self, path, rel_path, name, dir_rel_path):
+        self.path = sys.intern(path)
+        self.rel_path = sys.intern(rel_path)
+        self.name = sys.intern(name)
+        self.dir_rel_path = sys.intern(dir_rel_path)
+
+    @classmethod
+    def get(cls, options, path):
+        """Returns the shared object of path; the paths are only calculated once per file"""
+        source_file = cls.__source_files.get(path)
+        if not source_file:
+            rel_path = os.path.relpath(path, options.project_root_path)
+            source_file = cls.restore(path, rel_path, os.path.basename(path), os.path.dirname(rel_path))
+        return source_file
+
+    @classmethod
+    def restore(cls, path, rel_path, name, dir_rel_path):
+        source_file = cls.__source_files.get(path)
+        if not source_file:
+            source_file = cls.__source_files[path] = cls(path, rel_path, name, dir_rel_path)
+        return source_file
+
+    def __reduce__(self):
+        # unpickled objects are shared as well
+        return (ReportSourceFile.restore, (self.path, self.rel_path, self.name, self.dir_rel_path))
+
+    def __repr__(self):
+        return 'ReportSourceFile { ' + \
+            'path: ' + repr(self.path) + ', ' + \
+            'rel_path: ' + repr(self.rel_path) + ', ' + \
+            'name: ' + repr(self.name) + ', ' + \
+            'dir_rel_path: ' + repr(self.dir_rel_path) + ' }'
+
 class ReportCallStackFrame(object):
     """A specific frame of a call stack"""
 
+    __slots__ = ('func_name', 'src_file', 'line_num', 'char_pos')
+
     def __init__(self, options, func_name, src_file_path, line_num, char_pos):
-        self.func_name = func_name
-        self.src_file_path = src_file_path
-        self.src_file_rel_path = None if not src_file_path else os.path.relpath(src_file_path, options.project_root_path)
-        self.src_file_name = None if not src_file_path else os.path.basename(src_file_path)
-        self.src_file_dir_rel_path = None if not src_file_path else os.path.dirname(self.src_file_rel_path)
+        self.func_name = None if not func_name else sys.intern(func_name)
+        self.src_file = None if not src_file_path else ReportSourceFile.get(options, src_file_path)
         self.line_num = None if not line_num else int(line_num)
         self.char_pos = None if not char_pos else int(char_pos)
 
+    @property
+    def src_file_path(self):
+        return None if not self.src_file else self.src_file.path
+
+    @property
+    def src_file_rel_path(self):
+        return None if not self.src_file else self.src_file.rel_path
+
+    @property
+    def src_file_name(self):
+        return None if not self.src_file else self.src_file.name
+
+    @property
+    def src_file_dir_rel_path(self):
+        return None if not self.src_file else self.src_file.dir_rel_path
+
+    def pack(self):
+        """Returns the frame as plain data; the arguments of the constructor"""
+        return [self.func_name, self.src_file_path, self.line_num, self.char_pos]
+
+    def __setstate__(self, state):
+        # unpickled function names are interned as well
+        for name, value in state[1].items():
+            setattr(self, name, sys.intern(value) if name == 'func_name' and value else value)
+
     def __repr__(self):
         return 'ReportCallStackFrame { ' + \
             'func_name: ' + repr(self.func_name) + ', ' + \
@@ -163,15 +298,21 @@ class ReportExtractor(object):
     __reports_dir_name = 'reports'
     __report_file_name_pattern = re.compile('^(?P<number>\d{5})\.report$', re.IGNORECASE)
 
-    def __init__(self, options, sanitizer):
+    def __init__(self, options, sanitizer, cache=None, detector=None):
         self.__options = options
         self.__sanitizer = sanitizer
+        self.__cache = cache
+        self.__detector = detector # drops duplicates before they are stored
         self.__printer = Printer(options)
         # category.number
         self.__counters = {}
         self.__reports_dir_base_path = os.path.join(
             options.output_root_path, self.__reports_dir_name, sanitizer.name_short)
-        self.__report_file = None
+        # category_name, lines
+        self.__block = None
+        # category_name, text, call_stacks, special; only used when the blocks are stored later on (e.g. by
+        # another process)
+        self.__deferred_blocks = None
         self.__reports = []
 
     @property
@@ -181,19 +322,110 @@ class ReportExtractor(object):
         self.__reports = []
         return r
 
-    def _extract_start(self, report):
+    def defer_blocks(self):
+        """Keep extracted blocks in memory instead of storing them as reports right away"""
+        self.__deferred_blocks = []
+        return self
+
+    @property
+    def deferred_blocks(self):
+        """Get deferred blocks and remove them from the extractor"""
+        b = self.__deferred_blocks
+        self.__deferred_blocks = []
+        return b
+
+    def flush(self):
+        """Finish the block that is still in flight (e.g. at the end of a logfile); returns the category of that
+        block or None, if there was nothing in flight"""
+        if not self.__block:
+            return None
+        category_name = self.__block[0]
+        self._extract_end()
+        return category_name
+
+    def discard(self):
+        """Forget the block that is still in flight; it will be read again from its start position"""
+        self.__block = None
+
+    def walk_start(self, pos):
+        """Prepare a line-by-line walk that starts at the byte position pos"""
+        self.__walk_last_line = ''
+        self.__walk_consumed = pos
+
+    def walk(self, pos, line):
+        """Extract from a raw line (bytes) that starts at the byte position pos"""
+        # mind: a raw line might consist of several lines of text (separated by a lone '\r')
+        for text in io.StringIO(self._decode(line)):
+            self.extract(self.__walk_last_line, text)
+            self.__walk_last_line = text
+        if not self.__block and line.endswith(b'\n'):
+            # this line can be read again safely since it is not part of an unfinished block
+            self.__walk_consumed = pos
+
+    def walk_end(self):
+        """Returns the byte position up to which everything has been consumed"""
+        return self.__walk_consumed
+
+    def extract_blocks(self, data, pos=0):
+        """Walk through data (bytes-like, e.g. a memory-mapped logfile), starting at the byte position pos;
+        returns the byte position up to which everything has been consumed; can be overridden with a bulk
+        scanner"""
+        self.walk_start(pos)
+        while pos < len(data):
+            end = data.find(b'\n', pos)
+            end = len(data) if end < 0 else end + 1
+            self.walk(pos, data[pos:end])
+            pos = end
+        return self.walk_end()
+
+    def boundary(self, data, pos):
+        """Returns (end, start) of the first block boundary at or after the byte position pos or None; everything
+        before end and everything from start on can be scanned independently of each other; can be overridden,
+        nothing is split by default"""
+        return None
+
+    def _decode(self, data):
+        # behave like a file that is opened with universal newlines
+        return bytes(data).decode('utf-8', 'replace').replace('\r\n', '\n').replace('\r', '\n')
+
+    def store_block(self, category_name, text, call_stacks, special):
+        """Make a new report out of an extracted (and parsed) block and write its file"""
+        if self.__detector and self.__detector.supports(self.__sanitizer.name_short, category_name):
+            identifiers = self.__detector.identifiers(self.__sanitizer.name_short, category_name, call_stacks)
+            # mind: reports without identifiers are stored; the elimination of duplicates will complain about them
+            if identifiers and not self.__detector.add(self.__sanitizer.name_short, category_name, identifiers):
+                self.__printer.task_info('skipping a duplicate ' + category_name + ' (' + self.__sanitizer.name + ')')
+                return
+        report = self._make_and_add_report(True, category_name)
+        report.call_stacks = call_stacks
+        report.special.update(special)
         utils.files.makedirs(os.path.dirname(report.file_path))
-        self.__report_file = open(report.file_path, 'w')
+        with open(report.file_path, 'w') as report_file:
+            report_file.write(text)
+            report_file.close()
+
+    def _extract_start(self, category_name):
+        self.__block = (category_name, [])
 
     def _extract_continue(self, line):
-        if not self.__report_file:
+        if not self.__block:
             return False
-        self.__report_file.write(line)
+        self.__block[1].append(line)
         return True
 
     def _extract_end(self):
-        self.__report_file.close()
-        self.__report_file = None
+        category_name, lines = self.__block
+        self.__block = None
+        text = ''.join(lines)
+        # parse the block right away; the report file does not have to be read again afterwards
+        # mind: str.splitlines() would split at more than '\n' (e.g. '\f' or '\x85') unlike reading the file again
+        parsed = ReportCallStackExtractor(self.__options).extract_lines(
+            self.__sanitizer.name_short, category_name, io.StringIO(text))
+        block = (category_name, text, parsed.call_stacks, parsed.special)
+        if self.__deferred_blocks is None:
+            self.store_block(*block)
+        else:
+            self.__deferred_blocks.append(block)
 
     def __get_category_dir_path(self, category_name):
         return os.path.join(self.__reports_dir_base_path, category_name.lower().replace(' ', '-'))
@@ -215,7 +447,8 @@ class ReportExtractor(object):
                         self.__sanitizer,
                         category_name,
                         number,
-                        self.__get_report_file_path(category_name, number))
+                        self.__get_report_file_path(category_name, number),
+                        self.__cache)
         self.__printer.task_info('adding ' + str(report))
         self.__reports.append(report)
         return report
@@ -237,9 +470,10 @@ class TSanReportExtractor(ReportExtractor):
     __start_line_pattern = re.compile('^warning: threadsanitizer: (?P<category>[a-z ]+) \(', re.IGNORECASE)
     __start_last_line_pattern = re.compile('^={18}$', re.MULTILINE)
     __end_line_pattern = __start_last_line_pattern
+    __separator = b'=' * 18
 
-    def __init__(self, options):
-        super(TSanReportExtractor, self).__init__(options, Sanitizer('ThreadSanitizer', 'tsan'))
+    def __init__(self, options, cache=None, detector=None):
+        super(TSanReportExtractor, self).__init__(options, Sanitizer('ThreadSanitizer', 'tsan'), cache, detector)
         self.__printer = Printer(options)
 
     def collect(self):
@@ -253,15 +487,76 @@ class TSanReportExtractor(ReportExtractor):
         else:
             search = self.__start_line_pattern.search(line)
             if search and self.__start_last_line_pattern.search(last_line):
-                category = search.group('category').lower()
-                if not category in self.__category_names:
-                    self.__printer.bailout('unkown category ' + repr(category))
-                else:
-                    self._extract_start(self._make_and_add_report(True, category))
-                    self._extract_continue(last_line + line)
+                # mind: unknown categories are rejected when storing; scanning might happen in another process
+                self._extract_start(search.group('category').lower())
+                self._extract_continue(last_line + line)
+
+    def extract_blocks(self, data, pos=0):
+        # only the separator lines are of interest; everything in between is skipped with bulk searches
+        start = pos
+        pos = self.__find_separator(data, pos)
+        while pos is not None:
+            start_line_pos = self.__next_line_pos(data, pos)
+            start_line_end = self.__next_line_pos(data, start_line_pos)
+            search = self.__start_line_pattern.search(self._decode(data[start_line_pos:start_line_end]))
+            if not search:
+                pos = self.__find_separator(data, start_line_pos)
+                continue
+            end = self.__find_separator(data, start_line_end)
+            self._extract_start(search.group('category').lower())
+            self._extract_continue(self._decode(
+                data[pos:len(data) if end is None else self.__next_line_pos(data, end)]))
+            if end is None:
+                # the report is unfinished; it has to be read again from its separator
+                return pos
+            self._extract_end()
+            # the closing separator might open the next report
+            pos = end
+        # the last complete line might be the separator of a report that is about to be written
+        last_line_end = data.rfind(b'\n', start)
+        if last_line_end < 0:
+            return start
+        return max(start, data.rfind(b'\n', start, last_line_end) + 1)
+
+    def boundary(self, data, pos):
+        # the opening separator is scanned twice; it might close the report before it as well
+        pos = self.__find_separator(data, pos)
+        while pos is not None:
+            start_line_pos = self.__next_line_pos(data, pos)
+            start_line_end = self.__next_line_pos(data, start_line_pos)
+            if self.__start_line_pattern.search(self._decode(data[start_line_pos:start_line_end])):
+                return start_line_pos, pos
+            pos = self.__find_separator(data, start_line_pos)
+        return None
+
+    def __next_line_pos(self, data, pos):
+        end = data.find(b'\n', pos)
+        end = len(data) if end < 0 else end + 1
+        # a lone '\r' ends a line as well (universal newlines)
+        cr = data.find(b'\r', pos, end)
+        while cr >= 0 and data[cr + 1:cr + 2] == b'\n':
+            cr = data.find(b'\r', cr + 2, end)
+        return end if cr < 0 else cr + 1
+
+    def __find_separator(self, data, pos):
+        """Returns the position of the next line that only consists of the separator or None"""
+        separator_len = len(self.__separator)
+        while True:
+            pos = data.find(self.__separator, pos)
+            if pos < 0:
+                return None
+            end = pos + separator_len
+            if (pos == 0 or data[pos - 1:pos] in (b'\n', b'\r')) and data[end:end + 1] in (b'', b'\n', b'\r'):
+                return pos
+            pos = self.__next_line_pos(data, pos)
+
+    def store_block(self, category_name, text, call_stacks, special):
+        if not category_name in self.__category_names:
+            self.__printer.bailout('unkown category ' + repr(category_name))
+        super(TSanReportExtractor, self).store_block(category_name, text, call_stacks, special)
 
 class ReportCallStackExtractor(object):
-    """Extract call stackss"""
+    """Extract call stackss and (special) data of the whole report"""
 
     __stack_frame_pattern = re.compile(
         '^\s{4}\#\d+\s' +
@@ -273,10 +568,13 @@ class ReportCallStackExtractor(object):
         '^(?:previous\s)?(?:atomic\s)?' +
         '(?P<type>read|write)\sof\ssize\s(?P<bytes>\d+)\s' +
         'at\s0x[\da-f]+\sby\s', re.IGNORECASE)
+    __tsan_data_race_global_location_pattern = re.compile(
+        '^  location is global \'(?P<global_location>.+)\' of size \d', re.IGNORECASE)
     __tsan_thread_leak_title_pattern = re.compile('^thread\s(?P<name>.+)\s\(tid=\d+', re.IGNORECASE)
 
     def __init__(self, options):
         self.call_stacks = []
+        self.special = {}
         self.__options = options
         self.__add_context = {
             'tsan': {
@@ -284,27 +582,40 @@ class ReportCallStackExtractor(object):
                 'thread leak': self.__add_tsan_thread_leak_context
             }
         }
+        self.__analyse_line = {
+            'tsan': {
+                'data race': self.__analyse_tsan_data_race_line
+            }
+        }
 
     def extract(self, report):
         with open(report.file_path, 'r') as report_file:
-            add_context = self.__add_context.get(report.sanitizer.name_short, {}).get(report.category_name)
-            stack = None
-            last_line = ''
-            for line in report_file:
-                frame_search = self.__stack_frame_pattern.search(line)
-                if stack:
-                    if not self.__add_frame_from_search(stack, frame_search):
-                        if add_context:
-                            add_context(stack)
-                        self.call_stacks.append(stack)
-                        stack = None
-                elif frame_search:
-                    stack = ReportCallStack(last_line.strip())
-                    self.__add_frame_from_search(stack, frame_search)
-                last_line = line
+            self.extract_lines(report.sanitizer.name_short, report.category_name, report_file)
             report_file.close()
         return self
 
+    def extract_lines(self, sanitizer_name_short, category_name, lines):
+        Counters.add('call stack parses')
+        add_context = self.__add_context.get(sanitizer_name_short, {}).get(category_name)
+        analyse_line = self.__analyse_line.get(sanitizer_name_short, {}).get(category_name)
+        stack = None
+        last_line = ''
+        for line in lines:
+            frame_search = self.__stack_frame_pattern.search(line)
+            if stack:
+                if not self.__add_frame_from_search(stack, frame_search):
+                    if add_context:
+                        add_context(stack)
+                    self.call_stacks.append(stack)
+                    stack = None
+            elif frame_search:
+                stack = ReportCallStack(last_line.strip())
+                self.__add_frame_from_search(stack, frame_search)
+            if analyse_line and not frame_search:
+                analyse_line(line)
+            last_line = line
+        return self
+
     def __add_frame_from_search(self, stack, search):
         if not stack or not search:
             return False
@@ -322,6 +633,11 @@ class ReportCallStackExtractor(object):
             stack.special['tsan_data_race_type'] = search.group('type').lower()
             stack.special['tsan_data_race_bytes'] = int(search.group('bytes').lower())
 
+    def __analyse_tsan_data_race_line(self, line):
+        search = self.__tsan_data_race_global_location_pattern.search(line)
+        if search:
+            self.special['tsan_data_race_global_location'] = search.group('global_location')
+
     def __add_tsan_thread_leak_context(self, stack):
         search = self.__tsan_thread_leak_title_pattern.search(stack.title)
         if search:
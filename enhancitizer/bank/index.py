@@ -0,0 +1,77 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+import base64
+import json
+import os
+
+class ReportsIndex(object):
+    """Keeps the parsed data of all reports in the output folder so that they don't have to be parsed again
+
+    The index only consists of plain data (JSON); nothing in the output folder is able to run code when it is
+    loaded.
+    """
+
+    __file_name = 'reports.index'
+    __version = 4 # has to be increased whenever the parsed data (e.g. ReportCallStack) changes
+
+    def __init__(self, options):
+        self.__output_root_path = options.output_root_path
+        self.__project_root_path = options.project_root_path
+        self.__file_path = os.path.join(options.output_root_path, self.__file_name)
+        # rel_file_path.(mtime_ns, size, packed)
+        self.__data = {}
+
+    def load(self):
+        """Load the index in one go"""
+        if os.path.isfile(self.__file_path):
+            with open(self.__file_path, 'r') as index_file:
+                try:
+                    index = json.load(index_file)
+                    version, project_root_path, data = index['version'], index['project_root'], index['reports']
+                except Exception:
+                    version, project_root_path, data = None, None, {}
+                index_file.close()
+            # the relative paths of the source files depend on the project root
+            if version == self.__version and project_root_path == self.__project_root_path:
+                self.__data = data
+        return self
+
+    def restore(self, report):
+        """Hand the indexed data to the report, if the report file has not been changed since"""
+        entry = self.__data.pop(self.__rel_path(report.file_path), None)
+        if entry:
+            mtime_ns, size, packed = entry
+            stat = os.stat(report.file_path)
+            # mind: the report files themselves are never read here; that is the whole point of the index
+            if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+                report.packed = base64.b64decode(packed)
+
+    def save(self, reports):
+        """Write the index of all reports"""
+        data = {}
+        for report in reports:
+            stat = os.stat(report.file_path)
+            data[self.__rel_path(report.file_path)] = (
+                stat.st_mtime_ns, stat.st_size, base64.b64encode(report.packed).decode())
+        buffer_file_path = self.__file_path + '.buffer'
+        with open(buffer_file_path, 'w') as buffer_file:
+            json.dump({
+                'version': self.__version,
+                'project_root': self.__project_root_path,
+                'reports': data
+            }, buffer_file, separators=(',', ':'))
+            buffer_file.close()
+        os.replace(buffer_file_path, self.__file_path)
+        self.__data = {}
+        return self
+
+    def __rel_path(self, file_path):
+        return os.path.relpath(file_path, self.__output_root_path)
@@ -8,22 +8,29 @@
 #
 # ------------------------------------------------------------------------------
 
+from threading import Lock
 import time
 
 from bank.bank import ReportsBank
 from tasks.analysing import TaskAnalyseReports
 from tasks.blacklist import TaskCreateTSanBlacklist
+from tasks.clustering import TaskClusterReports
 from tasks.compaction import TaskCompactReports
 from tasks.context import TaskAddTSanContext
 from tasks.csv import TaskCreateCsvSummaries
 from tasks.duplication import TaskEliminateDuplicateReports
 from tasks.skeleton import TaskBuildSkeleton
+from tasks.sqlite import TaskExportSqlite
 from tasks.stuff import TaskSummary
+from utils.metrics import Metrics, Profiles
 from utils.printer import Printer
+from utils.scheduler import TaskScheduler
 from utils.utils import StopWatch
 
 class Enhancitizer(object):
-    
+
+    __follow_interval = 1 # seconds between two looks at the logfiles in follow mode
+
     def __init__(self, options):
         self.__options = options
         self.__printer = Printer(options)
@@ -35,40 +42,182 @@ class Enhancitizer(object):
 
     def run(self):
         """Run the enhancitizer"""
+        self.__printer.open_log()
+        try:
+            with Metrics(self.__options) as self.__metrics:
+                self.__run()
+        finally:
+            self.__printer.close_log()
+
+    def __run(self):
         bank = ReportsBank(self.__options)
+        self.__profiles = Profiles(self.__options)
         self.__printer.welcome() \
                       .settings() \
                       .task_description('Collecting existing reports ...')
         watch = StopWatch().start()
-        bank.collect_reports()
+        with self.__metrics.measure('collecting') as measurement:
+            progress = self.__printer.progress('collecting', None, lambda: len(bank))
+            bank.collect_reports()
+            self.__printer.progress_done(progress)
+            measurement.reports = len(bank)
         self.__printer.task_info_debug('execution time: ' + str(watch)) \
                       .nl() \
                       .task_description('Extracting new reports ...')
         watch.start()
-        for path in self.__options.logfiles_paths:
-            bank.extract_reports(path)
+        with self.__metrics.measure('extracting') as measurement:
+            reports_count = len(bank)
+            progress = self.__printer.progress('extracting', None, lambda: len(bank) - reports_count)
+            if self.__options.jobs > 1:
+                bank.extract_reports_parallel(self.__options.logfiles_paths, self.__options.jobs)
+            else:
+                for path in self.__options.logfiles_paths:
+                    bank.extract_reports(path)
+            self.__printer.progress_done(progress)
+            measurement.reports = len(bank) - reports_count
         self.__printer.task_info_debug('execution time: ' + str(watch)).nl()
+        # mind: independent tasks (see their reads and writes) might run concurrently; the order matters anyway
         tasks = [
             TaskEliminateDuplicateReports(bank), # should be the first thing
             TaskCompactReports(), # after the elimination, before "real" tasks
             TaskAnalyseReports(), # after the elimination, before "real" tasks
+            TaskClusterReports(), # after the compaction, before the summaries
             TaskCreateTSanBlacklist(),
             TaskBuildSkeleton(),
             TaskCreateCsvSummaries(),
+            TaskExportSqlite(),
             TaskAddTSanContext(), # should run late to speed up stack parsing of the previous tasks
             TaskSummary() # should be the last thing
         ]
         tasks.extend(self.__tasks)
-        for task in tasks:
-            watch.start()
-            if hasattr(task, 'description'):
-                self.__printer.task_description(task.description)
+        if self.__options.pipeline:
+            self.__run_pipeline(bank, tasks, watch)
+        else:
+            self.__run_scheduled(bank, tasks)
+        if self.__options.follow:
+            self.__follow(bank, tasks)
+        watch.start()
+        with self.__metrics.measure('saving the index') as measurement:
+            bank.save_index()
+            measurement.reports = len(bank)
+        self.__printer.task_info_debug('index saving time: ' + str(watch)) \
+                      .task_info_debug('call stacks cache: ' + str(bank.cache))
+        self.__metrics.save()
+        self.__profiles.save()
+
+    def __run_scheduled(self, bank, tasks):
+        """Run the tasks in the order of their dependencies; every task walks through the whole bank with its own
+        cursor and independent tasks run concurrently (if there are several jobs)"""
+        # mind: the profiles of concurrent tasks would be incomplete (cProfile only follows one thread)
+        jobs = 1 if self.__profiles.enabled else self.__options.jobs
+        if jobs < 2:
+            TaskScheduler(tasks).run(lambda task: self.__run_task(bank, task), jobs)
+            return
+        # the output of every task is buffered and released in the order of the tasks; it stays the same
+        positions = dict((id(task), i) for i, task in enumerate(tasks))
+        buffers = {} # position.buffer
+        released = [0]
+        lock = Lock()
+        def run_task(task):
+            try:
+                with Printer.buffered() as buffer:
+                    self.__run_task(bank, task)
+            finally:
+                with lock:
+                    buffers[positions[id(task)]] = buffer
+                    while released[0] in buffers:
+                        self.__printer.release(buffers.pop(released[0]))
+                        released[0] += 1
+        TaskScheduler(tasks).run(run_task, jobs)
+
+    def __run_task(self, bank, task):
+        watch = StopWatch().start()
+        name = type(task).__name__
+        if hasattr(task, 'description'):
+            self.__printer.task_description(task.description)
+        with self.__metrics.measure(name, 'task') as measurement, self.__profiles.profile(name):
             if hasattr(task, 'setup'):
                 task.setup(self.__options)
             if hasattr(task, 'process'):
+                progress = self.__printer.progress(name, len(bank))
                 for report in bank:
                     task.process(report)
-            if hasattr(task, 'teardown'):
-                task.teardown()
-            if hasattr(task, 'description'):
-                self.__printer.task_info_debug('execution time: ' + str(watch)).nl()
+                    progress.advance()
+                self.__printer.progress_done(progress)
+                measurement.reports = progress.done
+            self.__finish(task)
+        if hasattr(task, 'description'):
+            self.__printer.task_info_debug('execution time (' + task.description + '): ' + str(watch)).nl()
+
+    def __run_pipeline(self, bank, tasks, watch):
+        """Walk through the bank once and push every report through the process() stages of all tasks"""
+        watch.start()
+        self.__printer.task_description('Running the tasks in a pipeline ...')
+        with self.__metrics.measure('pipeline') as measurement:
+            for task in tasks:
+                if hasattr(task, 'setup'):
+                    self.__profiles.wrap(type(task).__name__, task.setup)(self.__options)
+            stages = [self.__profiles.wrap(type(task).__name__, task.process)
+                      for task in tasks if hasattr(task, 'process')]
+            progress = self.__printer.progress('pipeline', len(bank))
+            for report in bank:
+                progress.advance()
+                for process in stages:
+                    # a task can hold back a report from the following stages (e.g. because it has been removed)
+                    if process(report) == False:
+                        break
+            self.__printer.progress_done(progress)
+            measurement.reports = progress.done
+        self.__printer.task_info_debug('execution time: ' + str(watch)).nl()
+        for task in tasks:
+            if hasattr(task, 'flush' if self.__options.follow else 'teardown'):
+                watch.start()
+                name = type(task).__name__
+                if hasattr(task, 'description'):
+                    self.__printer.task_description(task.description)
+                with self.__metrics.measure(name + ' (teardown)', 'task'), self.__profiles.profile(name):
+                    self.__finish(task)
+                if hasattr(task, 'description'):
+                    self.__printer.task_info_debug('execution time: ' + str(watch)).nl()
+
+    def __finish(self, task):
+        """Tear the task down; in follow mode, only flush it since more reports are still to come"""
+        if self.__options.follow:
+            if hasattr(task, 'flush'):
+                task.flush()
+        elif hasattr(task, 'teardown'):
+            task.teardown()
+
+    def __follow(self, bank, tasks):
+        """Keep extracting new reports from the logfiles and push only them through the tasks; the tasks are torn
+        down when the user stops following (Ctrl+C)"""
+        self.__printer.task_description('Following the logfiles (stop with Ctrl+C) ...')
+        stages = [task for task in tasks if hasattr(task, 'process')]
+        try:
+            with self.__metrics.measure('following') as measurement:
+                try:
+                    while True:
+                        time.sleep(self.__follow_interval)
+                        reports = []
+                        for path in self.__options.logfiles_paths:
+                            try:
+                                reports.extend(bank.extract_reports(path))
+                            except FileNotFoundError:
+                                # the logfile is being rotated (or is gone); it is read again once it is back
+                                pass
+                        if reports:
+                            for report in reports:
+                                for task in stages:
+                                    # a task can hold back a report from the following stages (e.g. a duplicate)
+                                    if task.process(report) == False:
+                                        break
+                            for task in tasks:
+                                if hasattr(task, 'flush'):
+                                    task.flush()
+                            measurement.reports += len(reports)
+                except KeyboardInterrupt:
+                    self.__printer.nl()
+        finally:
+            for task in tasks:
+                if hasattr(task, 'teardown'):
+                    task.teardown()
@@ -11,10 +11,12 @@
 __all__ = [
     'analysing',
     'blacklist',
+    'clustering',
     'compaction',
     'context',
     'csv',
     'duplication',
     'skelton',
+    'sqlite',
     'stuff'
 ]
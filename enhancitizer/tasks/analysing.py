@@ -8,17 +8,14 @@
 #
 # ------------------------------------------------------------------------------
 
-import re
-
 from utils.printer import Printer
 
 class TaskAnalyseReports(object):
     """Analyse reports and add (special) data"""
 
     description = 'Analysing reports ...'
-
-    __tsan_data_race_global_location_pattern = re.compile(
-        '^  location is global \'(?P<global_location>.+)\' of size \d', re.IGNORECASE)
+    reads = ['reports', 'report files']
+    writes = []
 
     def setup(self, options):
         self.__printer = Printer(options)
@@ -33,10 +30,6 @@ class TaskAnalyseReports(object):
             self.__analysing_funcs[report.sanitizer.name_short][report.category_name](report)
 
     def __tsan_analyse_data_race(self, report):
-        with open(report.file_path, 'r') as report_file:
-            for line in report_file:
-                search = self.__tsan_data_race_global_location_pattern.search(line)
-                if search:
-                    self.__printer.task_info('found global location of ' + str(report))
-                    report.special['tsan_data_race_global_location'] = search.group('global_location')
-            report_file.close()
+        # the global location is found while parsing the report; new reports have been parsed during extraction
+        if report.call_stacks != None and 'tsan_data_race_global_location' in report.special:
+            self.__printer.task_info('found global location of ' + str(report))
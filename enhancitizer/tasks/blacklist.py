@@ -28,6 +28,7 @@ class TaskCreateBlacklist(object):
         # dir_name.file_name.func_name
         self.__printer = Printer(options)
         self.__data = OrderedDict()
+        self.__dirty = True # the (maybe empty) blacklist has not been written yet
 
     def _add_stack_frame(self, frame):
         if frame.complete:
@@ -40,9 +41,17 @@ class TaskCreateBlacklist(object):
                 self.__data[dir_name][file_name] = []
             if not func_name in self.__data[dir_name][file_name]:
                 self.__data[dir_name][file_name].append(func_name)
+                self.__dirty = True
             self.__printer.task_info('adding ' + func_name + ' (' + frame.src_file_rel_path + ')')
 
     def teardown(self):
+        self.flush()
+
+    def flush(self):
+        """(Re)write the blacklist, if functions have been added since the last time"""
+        if not self.__dirty:
+            return
+        self.__dirty = False
         self.__printer.task_info('creating ' + self.__blacklist_file_path)
         utils.files.makedirs(os.path.dirname(self.__blacklist_file_path))
         with open(self.__blacklist_file_path, 'w') as blacklist_file:
@@ -61,6 +70,8 @@ class TaskCreateBlacklist(object):
 class TaskCreateTSanBlacklist(TaskCreateBlacklist):
 
     description = 'Creating TSan blacklist ...'
+    reads = ['reports', 'report files']
+    writes = ['blacklists']
 
     __supported_sanitizer_name_short = 'tsan'
     __supported_category_names = ['data race']
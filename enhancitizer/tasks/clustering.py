@@ -0,0 +1,117 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from collections import Counter
+import hashlib
+import random
+
+from utils.printer import Printer
+
+class TaskClusterReports(object):
+    """Group reports that are nearly the same (e.g. only their line numbers differ) into clusters"""
+
+    description = 'Clustering similar reports ...'
+    reads = ['reports', 'report files']
+    writes = ['clusters']
+
+    __signature_size = 32 # amount of hash functions of a MinHash signature
+    __bands_count = 8 # amount of LSH bands; every band covers __signature_size / __bands_count hashes
+    __similarity_threshold = 0.6 # min estimated Jaccard similarity between a report and a cluster
+    __max_candidates = 64 # max amount of clusters that are compared with a report
+    __max_bucket_size = 256 # max amount of clusters per band key; further clusters are found through other bands
+    __tsan_data_race_max_stack_frames = 5
+    __prime = (1 << 61) - 1
+
+    def setup(self, options):
+        self.__printer = Printer(options)
+        rand = random.Random(0) # the clusters have to be the same for every run
+        self.__hash_coefficients = [(rand.randrange(1, self.__prime), rand.randrange(0, self.__prime))
+                                    for i in range(self.__signature_size)]
+        self.__controls = {
+            'tsan': {
+                'data race': {
+                    'features_func': self.__tsan_data_race_features,
+                    'special_name': 'tsan_data_race_cluster'
+                }
+            }
+        }
+        # sanitizer.category.(signatures|buckets)
+        self.__data = {}
+
+    def process(self, report):
+        controls = self.__controls.get(report.sanitizer.name_short, {}).get(report.category_name)
+        if not controls:
+            return
+        features = controls['features_func'](report)
+        if not features:
+            return
+        data = self.__get_data(report.sanitizer.name_short, report.category_name)
+        signature = self.__signature(features)
+        band_keys = self.__band_keys(signature)
+        cluster, similarity = self.__find_cluster(data, signature, band_keys)
+        if cluster:
+            self.__printer.task_info(
+                'adding ' + str(report) + ' to cluster #' + str(cluster) + ' (' + str(round(similarity, 2)) + ')')
+        else:
+            # the first report of a cluster represents it
+            data['signatures'].append(signature)
+            cluster = len(data['signatures'])
+        for band, band_key in enumerate(band_keys):
+            clusters = data['buckets'][band].get(band_key)
+            if not clusters:
+                data['buckets'][band][band_key] = {cluster}
+            elif len(clusters) < self.__max_bucket_size:
+                clusters.add(cluster)
+        report.special[controls['special_name']] = cluster
+
+    def __get_data(self, sanitizer_name_short, category_name):
+        if not sanitizer_name_short in self.__data:
+            self.__data[sanitizer_name_short] = {}
+        if not category_name in self.__data[sanitizer_name_short]:
+            self.__data[sanitizer_name_short][category_name] = {
+                'signatures': [], # cluster - 1 = index
+                'buckets': [{} for i in range(self.__bands_count)] # band.band_key.clusters
+            }
+        return self.__data[sanitizer_name_short][category_name]
+
+    def __find_cluster(self, data, signature, band_keys):
+        """Returns the most similar cluster (or None) and the similarity"""
+        # cluster.amount of shared bands; the clusters that share the most bands are the most promising ones
+        candidates = Counter()
+        for band, band_key in enumerate(band_keys):
+            candidates.update(data['buckets'][band].get(band_key, ()))
+        ranked_candidates = sorted(candidates.items(), key=lambda candidate: (-candidate[1], candidate[0]))
+        best_cluster, best_similarity = None, 0
+        for cluster, shared_bands in ranked_candidates[:self.__max_candidates]:
+            cluster_signature = data['signatures'][cluster - 1]
+            similarity = sum(1 for a, b in zip(signature, cluster_signature) if a == b) / self.__signature_size
+            if similarity >= self.__similarity_threshold and similarity > best_similarity:
+                best_cluster, best_similarity = cluster, similarity
+        return best_cluster, best_similarity
+
+    def __signature(self, features):
+        hashes = [int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+                  for feature in features]
+        return tuple(min((a * h + b) % self.__prime for h in hashes) for a, b in self.__hash_coefficients)
+
+    def __band_keys(self, signature):
+        rows = self.__signature_size // self.__bands_count
+        return [signature[band * rows:(band + 1) * rows] for band in range(self.__bands_count)]
+
+    def __tsan_data_race_features(self, report):
+        # line numbers and char positions are left out on purpose; they change with every edit of a source file
+        features = set()
+        for stack in report.call_stacks:
+            if 'tsan_data_race_type' in stack.special:
+                for i in range(min(len(stack.frames), self.__tsan_data_race_max_stack_frames)):
+                    frame = stack.frames[i]
+                    if frame.func_name or frame.src_file_rel_path:
+                        features.add(str(i) + ':' + str(frame.func_name) + '@' + str(frame.src_file_rel_path))
+        return features
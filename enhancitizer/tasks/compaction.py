@@ -16,11 +16,15 @@ from utils.printer import Printer
 class TaskCompactReports(object):
 
     description = 'Compacting reports ...'
+    reads = ['reports']
+    writes = ['reports', 'report files']
 
     def setup(self, options):
         self.__printer = Printer(options)
         # sanitizer.category.count
         self.__data = {}
+        # dir_path.(old_file_name, new_file_name, report)
+        self.__renames = {}
 
     def process(self, report):
         sanitizer = report.sanitizer.name_short
@@ -34,8 +38,32 @@ class TaskCompactReports(object):
         number_new = self.__data[sanitizer][category]
         if number_new != number_orig:
             orig_report_str = str(report)
-            new_file_path = utils.files.report_file_path(os.path.dirname(report.file_path), number_new)
-            os.rename(report.file_path, new_file_path)
+            # the new number is valid right away; the file is renamed with all the others in the teardown
             report.number = number_new
-            report.file_path = new_file_path
+            dir_path = os.path.dirname(report.file_path)
+            if not dir_path in self.__renames:
+                self.__renames[dir_path] = []
+            self.__renames[dir_path].append((
+                os.path.basename(report.file_path),
+                os.path.basename(utils.files.report_file_path(dir_path, number_new)),
+                report))
             self.__printer.task_info('renaming: ' + orig_report_str + ' -> ' + str(report))
+
+    def flush(self):
+        """Rename the files of all reports that have been processed so far"""
+        # numbers only ever decrease and duplicates are gone already; renaming in ascending order never
+        # overwrites a report that has not been renamed yet
+        for dir_path, renames in sorted(self.__renames.items(), key=lambda r: r[0]):
+            # sidecar files with context move along with their reports
+            file_names = set(os.listdir(dir_path))
+            with utils.files.DirectoryRenamer(dir_path) as renamer:
+                for old_file_name, new_file_name, report in sorted(renames, key=lambda r: r[2].number):
+                    renamer.rename(old_file_name, new_file_name)
+                    old_context_file_name = utils.files.context_file_path(old_file_name)
+                    if old_context_file_name in file_names:
+                        renamer.rename(old_context_file_name, utils.files.context_file_path(new_file_name))
+                    report.file_path = os.path.join(dir_path, new_file_name)
+        self.__renames = {}
+
+    def teardown(self):
+        self.flush()
@@ -11,12 +11,17 @@
 import re
 import os
 
+import utils.files
 from utils.files import SourceCodeLine
 from utils.printer import Printer
+from utils.signatures import FunctionSignatures
+from utils.utils import Workers
 
 class TaskAddTSanContext(object):
 
     description = 'Adding TSan context ...'
+    reads = ['reports', 'report files']
+    writes = ['report files']
 
     __supported_sanitizer_name_short = 'tsan'
     __supported_category_names = ['data race']
@@ -24,36 +29,70 @@ class TaskAddTSanContext(object):
     
     def setup(self, options):
         self.__printer = Printer(options)
+        self.__jobs = options.jobs
+        self.__sidecar = options.context_sidecar
+        self.__signatures = FunctionSignatures(os.path.join(options.output_root_path, 'cache', 'signatures'))
+        # report, context
+        self.__contexts = []
 
     def process(self, report):
         if report.is_new and \
            report.sanitizer.name_short == self.__supported_sanitizer_name_short and \
            report.category_name in self.__supported_category_names:
-            report_file_path = report.file_path
-            buffer_file_path = report_file_path + '.buffer'
             self.__printer.task_info('adding context to ' + str(report))
-            with open(buffer_file_path, 'w') as buffer_file:
-                buffer_file.write('\n')
-                for stack in report.call_stacks:
-                    if 'tsan_data_race_type' in stack.special:
-                        buffer_file.write(stack.title + '\n\n')
-                        for i in range(min(len(stack.frames), self.__max_stack_frames)):
-                            if stack.frames[i].complete:
-                                # TODO: find full function signature
+            context = '\n'
+            for stack in report.call_stacks:
+                if 'tsan_data_race_type' in stack.special:
+                    context += stack.title + '\n\n'
+                    for i in range(min(len(stack.frames), self.__max_stack_frames)):
+                        if stack.frames[i].complete:
+                            func_signature = self.__signatures.find(
+                                stack.frames[i].src_file_path, stack.frames[i].line_num, stack.frames[i].func_name)
+                            if not func_signature:
                                 func_signature = stack.frames[i].func_name + '(...)'
-                                line = SourceCodeLine(stack.frames[i].src_file_path, stack.frames[i].line_num)
-                                if line.line:
-                                    buffer_file.write(
-                                        func_signature + ' {\n' +
-                                        '  // ...\n' +
-                                        '! ' + line.line + '\n' +
-                                        (' ' * (stack.frames[i].char_pos - line.indent + 1)) + '^\n' +
-                                        '  // ...\n' +
-                                        '}\n\n')
-                with open(report_file_path, 'r') as report_file:
-                    for line in report_file:
-                        buffer_file.write(line)
-                    report_file.close()
-                buffer_file.close()
-            os.remove(report_file_path)
-            os.rename(buffer_file_path, report_file_path)
+                            line = SourceCodeLine(stack.frames[i].src_file_path, stack.frames[i].line_num)
+                            if line.line:
+                                context += \
+                                    func_signature + ' {\n' + \
+                                    '  // ...\n' + \
+                                    '! ' + line.line + '\n' + \
+                                    (' ' * (stack.frames[i].char_pos - line.indent + 1)) + '^\n' + \
+                                    '  // ...\n' + \
+                                    '}\n\n'
+            # the files are written in the teardown; other tasks (e.g. the compaction in a pipeline) might still
+            # rename them until then
+            self.__contexts.append((report, context))
+
+    def teardown(self):
+        self.flush()
+
+    def flush(self):
+        """Write the context of all reports that have been processed so far"""
+        with Workers(self.__jobs) as workers:
+            for report, context in self.__contexts:
+                if self.__sidecar:
+                    workers.submit(self.__write_sidecar, report.file_path, context)
+                else:
+                    workers.submit(self.__write, report.file_path, context)
+        self.__contexts = []
+        self.__signatures.save()
+
+    def __write_sidecar(self, report_file_path, context):
+        """Put the context into a separate file; the report file stays as it is"""
+        context_file_path = utils.files.context_file_path(report_file_path)
+        buffer_file_path = context_file_path + '.buffer'
+        with open(buffer_file_path, 'w') as buffer_file:
+            buffer_file.write(context)
+            buffer_file.close()
+        os.replace(buffer_file_path, context_file_path)
+
+    def __write(self, report_file_path, context):
+        buffer_file_path = report_file_path + '.buffer'
+        with open(buffer_file_path, 'w') as buffer_file:
+            buffer_file.write(context)
+            with open(report_file_path, 'r') as report_file:
+                for line in report_file:
+                    buffer_file.write(line)
+                report_file.close()
+            buffer_file.close()
+        os.replace(buffer_file_path, report_file_path)
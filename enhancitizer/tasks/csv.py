@@ -19,6 +19,8 @@ class TaskCreateCsvSummaries(object):
     """Summarise the reports and collect the info in CSV files"""
 
     description = 'Summarising the reports ...'
+    reads = ['reports', 'report files', 'clusters']
+    writes = ['summaries']
 
     __csv_base_dir_name = 'summaries'
     __csv_file_ending = '.csv'
@@ -29,6 +31,8 @@ class TaskCreateCsvSummaries(object):
     def setup(self, options):
         self.__printer = Printer(options)
         self.__csv_base_dir_path = os.path.join(options.output_root_path, self.__csv_base_dir_name)
+        self.__output_root_path = options.output_root_path
+        self.__context_sidecar = options.context_sidecar
         utils.files.makedirs(self.__csv_base_dir_path)
         self.__controls = {
             'tsan': {
@@ -62,6 +66,12 @@ class TaskCreateCsvSummaries(object):
             if 'process_func' in controls:
                 self.__write_row(sanitizer_name_short, category_name, controls['process_func'](report))
 
+    def flush(self):
+        for categories in self.__controls.values():
+            for controls in categories.values():
+                if 'csv' in controls:
+                    controls['csv']['file'].flush()
+
     def teardown(self):
         for categories in self.__controls.values():
             for controls in categories.values():
@@ -74,7 +84,8 @@ class TaskCreateCsvSummaries(object):
 
     def __header_tsan_data_race(self):
         field_names = ['folder', 'file', 'function', 'op', 'size']
-        return ['id'] + field_names + list(reversed(field_names)) + ['global location']
+        return ['id'] + field_names + list(reversed(field_names)) + ['global location', 'cluster'] + \
+            (['context'] if self.__context_sidecar else [])
 
     def __process_tsan_data_race(self, report):
         row = [report.number]
@@ -95,4 +106,13 @@ class TaskCreateCsvSummaries(object):
             row.extend([None, None, None, None, None])
         row = ['?' if not cell else cell for cell in row]
         row.append(report.special.get('tsan_data_race_global_location', ''))
+        row.append(report.special.get('tsan_data_race_cluster', ''))
+        if self.__context_sidecar:
+            # mind: the context of new reports is written later on and files might still be renamed (pipeline)
+            if report.is_new or report.context_file_path:
+                row.append(os.path.relpath(
+                    utils.files.context_file_path(utils.files.report_file_path(report.dir_path, report.number)),
+                    self.__output_root_path))
+            else:
+                row.append('')
         return row
@@ -13,19 +13,24 @@ import os
 import utils.files
 from utils.printer import Printer
 from utils.skeleton import Skeleton
+from utils.utils import Workers
 
 class TaskBuildSkeleton(object):
 
     description = 'Building the skeleton ...'
+    reads = ['reports', 'report files']
+    writes = ['skeleton']
 
     __root_dir_name = 'skeleton'
     __tsan_data_race_max_stack_depth = 3
 
     def setup(self, options):
         self.__root_dir_path = os.path.join(options.output_root_path, self.__root_dir_name)
+        self.__jobs = options.jobs
         utils.files.makedirs(self.__root_dir_path, True)
         self.__printer = Printer(options)
         self.__skeletons = {}
+        self.__dirty_skeletons = set() # src_file_rel_path of skeletons that have changed since the last flush
         self.__add_funcs = {
             'tsan': {
                 'data race': self.__add_tsan_data_race
@@ -44,6 +49,7 @@ class TaskBuildSkeleton(object):
                 self.__skeletons[file_rel_path] = Skeleton(stack_frame.src_file_path)
             self.__skeletons[file_rel_path].mark(
                 stack_frame.line_num, stack_frame.char_pos, str(report) + ' - frame #' + str(stack_frame_id))
+            self.__dirty_skeletons.add(file_rel_path)
 
     def __add_tsan_data_race(self, report):
         for stack in report.call_stacks:
@@ -52,11 +58,21 @@ class TaskBuildSkeleton(object):
                     self.__add(report, i, stack.frames[i])
 
     def teardown(self):
-        for src_file_path, skeleton in self.__skeletons.items():
-            skeleton_file_path = os.path.join(self.__root_dir_path, src_file_path + '.skeleton')
-            self.__printer.task_info(
-                'creating ' + skeleton_file_path + ' (' + str(skeleton.marked_lines_count) + ' lines)')
-            utils.files.makedirs(os.path.dirname(skeleton_file_path))
-            with open(skeleton_file_path, 'w') as skeleton_file:
-                skeleton.write(skeleton_file)
-                skeleton_file.close()
+        self.flush()
+
+    def flush(self):
+        """Write all skeletons that have changed since the last time"""
+        with Workers(self.__jobs) as workers:
+            for src_file_path in [path for path in self.__skeletons if path in self.__dirty_skeletons]:
+                skeleton = self.__skeletons[src_file_path]
+                skeleton_file_path = os.path.join(self.__root_dir_path, src_file_path + '.skeleton')
+                self.__printer.task_info(
+                    'creating ' + skeleton_file_path + ' (' + str(skeleton.marked_lines_count) + ' lines)')
+                utils.files.makedirs(os.path.dirname(skeleton_file_path))
+                workers.submit(self.__write, skeleton, skeleton_file_path)
+        self.__dirty_skeletons = set()
+
+    def __write(self, skeleton, skeleton_file_path):
+        with open(skeleton_file_path, 'w') as skeleton_file:
+            skeleton.write(skeleton_file)
+            skeleton_file.close()
@@ -0,0 +1,134 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+import os
+import sqlite3
+
+import utils.files
+from bank.duplication import DuplicateDetector
+from utils.printer import Printer
+
+class TaskExportSqlite(object):
+    """Export all reports, including all of their stacks and frames, into a SQLite database"""
+
+    description = 'Exporting the reports into SQLite ...'
+    reads = ['reports', 'report files', 'clusters']
+    writes = ['database']
+
+    __db_file_name = 'reports.sqlite'
+    __batch_size = 10000 # reports per transaction
+
+    __schema = [
+        'CREATE TABLE reports (id INTEGER PRIMARY KEY, sanitizer TEXT, category TEXT, number INTEGER, ' +
+        'file TEXT, new INTEGER)',
+        'CREATE TABLE stacks (id INTEGER PRIMARY KEY, report_id INTEGER, position INTEGER, title TEXT)',
+        'CREATE TABLE frames (stack_id INTEGER, position INTEGER, function TEXT, file TEXT, line INTEGER, ' +
+        'char INTEGER)',
+        # stack_id is NULL for special fields of reports
+        'CREATE TABLE specials (report_id INTEGER, stack_id INTEGER, name TEXT, value TEXT)',
+        'CREATE TABLE identifiers (report_id INTEGER, identifier TEXT)'
+    ]
+    # the indexes are created after all inserts; that is a lot faster than updating them on every insert
+    __indexes = [
+        'CREATE INDEX reports_category ON reports (sanitizer, category, number)',
+        'CREATE INDEX stacks_report ON stacks (report_id)',
+        'CREATE INDEX frames_stack ON frames (stack_id)',
+        'CREATE INDEX frames_function ON frames (function)',
+        'CREATE INDEX frames_file ON frames (file)',
+        'CREATE INDEX specials_report ON specials (report_id)',
+        'CREATE INDEX specials_name ON specials (name, value)',
+        'CREATE INDEX identifiers_identifier ON identifiers (identifier)'
+    ]
+
+    def setup(self, options):
+        self.__printer = Printer(options)
+        self.__output_root_path = options.output_root_path
+        self.__detector = DuplicateDetector()
+        self.__db_file_path = os.path.join(options.output_root_path, self.__db_file_name)
+        # the database is built aside and replaces the old one at the very end
+        self.__buffer_file_path = self.__db_file_path + '.buffer'
+        if os.path.isfile(self.__buffer_file_path):
+            os.remove(self.__buffer_file_path)
+        self.__printer.task_info('creating ' + self.__db_file_path)
+        # mind: the task might be set up and used by different threads (one after the other)
+        self.__db = sqlite3.connect(self.__buffer_file_path, check_same_thread=False)
+        self.__db.execute('PRAGMA journal_mode = OFF')
+        self.__db.execute('PRAGMA synchronous = OFF')
+        for statement in self.__schema:
+            self.__db.execute(statement)
+        self.__published = False
+        self.__report_id = 0
+        self.__stack_id = 0
+        self.__new_batch()
+
+    def process(self, report):
+        self.__report_id += 1
+        report_id = self.__report_id
+        self.__rows['reports'].append((
+            report_id,
+            report.sanitizer.name_short,
+            report.category_name,
+            report.number,
+            os.path.relpath(utils.files.report_file_path(report.dir_path, report.number), self.__output_root_path),
+            int(report.is_new)))
+        self.__add_specials(report_id, None, report.special)
+        for stack_pos, stack in enumerate(report.call_stacks):
+            self.__stack_id += 1
+            self.__rows['stacks'].append((self.__stack_id, report_id, stack_pos, stack.title))
+            self.__add_specials(report_id, self.__stack_id, stack.special)
+            self.__rows['frames'].extend([
+                (self.__stack_id, frame_pos, frame.func_name, frame.src_file_rel_path, frame.line_num, frame.char_pos)
+                for frame_pos, frame in enumerate(stack.frames)])
+        if self.__detector.supports(report.sanitizer.name_short, report.category_name):
+            identifiers = self.__detector.identifiers(
+                report.sanitizer.name_short, report.category_name, report.call_stacks)
+            self.__rows['identifiers'].extend([(report_id, identifier) for identifier in identifiers or []])
+        if len(self.__rows['reports']) >= self.__batch_size:
+            self.__insert_batch()
+
+    def flush(self):
+        """Make all reports that have been processed so far visible in the database"""
+        self.__insert_batch()
+        if not self.__published:
+            self.__published = True
+            with self.__db:
+                for statement in self.__indexes:
+                    self.__db.execute(statement)
+            self.__db.close()
+            os.replace(self.__buffer_file_path, self.__db_file_path)
+            # further reports (if any) go right into the published database
+            self.__db = sqlite3.connect(self.__db_file_path, check_same_thread=False)
+
+    def teardown(self):
+        self.flush()
+        self.__db.close()
+        self.__printer.task_info('exported ' + str(self.__report_id) + ' reports')
+
+    def __add_specials(self, report_id, stack_id, special):
+        self.__rows['specials'].extend([
+            (report_id, stack_id, name, None if value == None else str(value)) for name, value in special.items()])
+
+    def __new_batch(self):
+        self.__rows = {
+            'reports': [],
+            'stacks': [],
+            'frames': [],
+            'specials': [],
+            'identifiers': []
+        }
+
+    def __insert_batch(self):
+        """Insert all buffered rows within one transaction"""
+        with self.__db:
+            for table, rows in self.__rows.items():
+                if rows:
+                    self.__db.executemany(
+                        'INSERT INTO ' + table + ' VALUES (' + ', '.join(['?'] * len(rows[0])) + ')', rows)
+        self.__new_batch()
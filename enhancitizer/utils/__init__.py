@@ -12,5 +12,6 @@ __all__ = [
     'file',
     'options',
     'skeleton',
+    'sources',
     'utils'
 ]
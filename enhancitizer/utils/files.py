@@ -8,10 +8,25 @@
 #
 # ------------------------------------------------------------------------------
 
+import bz2
+import errno
+import gzip
+import lzma
 import os
 import re
 import shutil
 
+from utils.sources import SourceRepository
+
+# magic number pattern, module
+_compressions = [
+    (re.compile(b'^\x1f\x8b'), gzip),
+    (re.compile(b'^\xfd7zXZ\x00'), lzma),
+    # mind: 'BZh' alone is too common in plain text; the block size and the magic of the first block (or of the
+    # end of an empty stream) have to follow
+    (re.compile(b'^BZh[1-9](?:1AY&SY|\x17rE8P\x90)'), bz2)
+]
+
 def makedirs(dir_path, empty=False):
     """Guarantees that dir_path is an (empty) directory after this function is done"""
     if os.path.isfile(dir_path):
@@ -28,6 +43,47 @@ def makedirs(dir_path, empty=False):
 def report_file_path(dir_path, report_no):
     return os.path.join(dir_path, str(report_no).zfill(5) + '.report')
 
+def context_file_path(report_file_path):
+    """Returns the path of the sidecar file that holds the context of a report"""
+    return os.path.splitext(report_file_path)[0] + '.context'
+
+def compression(file_path):
+    """Returns the module (gzip, lzma or bz2) that is able to decompress file_path or None"""
+    with open(file_path, 'rb') as f:
+        magic = f.read(10)
+        f.close()
+    for magic_number_pattern, module in _compressions:
+        if magic_number_pattern.search(magic):
+            return module
+    return None
+
+def open_compressed(file_path, module):
+    """Open a compressed file for streaming its decompressed (binary) lines"""
+    return module.open(file_path, 'rb')
+
+class DirectoryRenamer(object):
+    """Renames lots of files within one directory; the directory is only looked up once, if possible"""
+
+    def __init__(self, dir_path):
+        self.__dir_path = dir_path
+        self.__dir_fd = None
+
+    def __enter__(self):
+        if os.rename in os.supports_dir_fd:
+            self.__dir_fd = os.open(self.__dir_path, os.O_RDONLY)
+        return self
+
+    def __exit__(self, *args):
+        if self.__dir_fd != None:
+            os.close(self.__dir_fd)
+            self.__dir_fd = None
+
+    def rename(self, old_file_name, new_file_name):
+        if self.__dir_fd != None:
+            os.rename(old_file_name, new_file_name, src_dir_fd=self.__dir_fd, dst_dir_fd=self.__dir_fd)
+        else:
+            os.rename(os.path.join(self.__dir_path, old_file_name), os.path.join(self.__dir_path, new_file_name))
+
 class SourceCodeLine(object):
     """Represents one line of a source code file"""
 
@@ -52,11 +108,8 @@ class SourceCodeLine(object):
         return self.__indent
 
     def __extract(self):
-        with open(self.file_path, 'r') as src_file:
-            for i, line in enumerate(src_file):
-                if i == self.num - 1:
-                    count_indent = self.__count_indent_pattern.search(line)
-                    self.__indent = 0 if not count_indent else len(count_indent.group('indent'))
-                    self.__line = line.strip()
-                    break
-            src_file.close()
+        line = SourceRepository.shared().line(self.file_path, self.num)
+        if line != None:
+            count_indent = self.__count_indent_pattern.search(line)
+            self.__indent = 0 if not count_indent else len(count_indent.group('indent'))
+            self.__line = line.strip()
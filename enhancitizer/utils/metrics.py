@@ -0,0 +1,254 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import cProfile
+import json
+import os
+import resource
+import sys
+from threading import Lock
+import time
+
+import utils.files
+
+class Counters(object):
+    """Counters of the whole process (e.g. call stack parses); cheap enough to be used everywhere"""
+
+    __lock = Lock()
+    # name.value
+    __values = {}
+
+    @classmethod
+    def add(cls, name, value=1):
+        with cls.__lock:
+            cls.__values[name] = cls.__values.get(name, 0) + value
+
+    @classmethod
+    def maximum(cls, name, value):
+        with cls.__lock:
+            cls.__values[name] = max(cls.__values.get(name, 0), value)
+
+    @classmethod
+    def get(cls, name):
+        return cls.__values.get(name, 0)
+
+def _read_io(fd=None):
+    """Returns the I/O counters of this process (Linux only) or nothing"""
+    io = {}
+    try:
+        if fd == None:
+            with open('/proc/self/io', 'rb') as io_file:
+                data = io_file.read()
+                io_file.close()
+        else:
+            data = os.pread(fd, 4096, 0)
+    except OSError:
+        return io
+    for line in data.decode().splitlines():
+        field, value = line.split(':')
+        io[field] = int(value)
+    return io
+
+class WorkerCounters(object):
+    """Counts what a worker process does within the with-statement; the parent adds the values to its own
+    counters, so that the measurements cover the workers as well"""
+
+    def __enter__(self):
+        # mind: the I/O counters are read outside of the counted part; reading them opens a file
+        self.__io = _read_io()
+        self.__counters = Counters.get('files opened'), Counters.get('call stack parses')
+        return self
+
+    def __exit__(self, *args):
+        files_opened, call_stack_parses = self.__counters
+        self.values = {
+            'files opened': Counters.get('files opened') - files_opened,
+            'call stack parses': Counters.get('call stack parses') - call_stack_parses,
+            # kilobytes on Linux
+            'workers peak rss kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        }
+        io = _read_io()
+        for field, value in io.items():
+            if field in self.__io:
+                self.values['workers ' + field] = value - self.__io[field]
+
+    @staticmethod
+    def merge(values):
+        """Add the values of a worker to the counters of this process"""
+        for name, value in values.items():
+            if name == 'workers peak rss kb':
+                Counters.maximum(name, value)
+            else:
+                Counters.add(name, value)
+
+class Measurement(object):
+    """The metrics of one phase or task; the measured code counts the reports it processes"""
+
+    def __init__(self, name, kind):
+        self.name = name
+        self.kind = kind
+        self.reports = 0
+
+class Metrics(object):
+    """Measures phases (e.g. the extraction) and tasks and writes the results into metrics.json
+
+    Every measurement covers the whole process, including the worker processes that report their counters (see
+    WorkerCounters); the metrics of tasks that run at the same time overlap. Opened files are only counted with
+    --profile; otherwise, files_opened is null.
+    """
+
+    __file_name = 'metrics.json'
+    __io_fields = ['rchar', 'wchar', 'read_bytes', 'write_bytes']
+    __hook_installed = False
+
+    def __init__(self, options):
+        self.__output_root_path = options.output_root_path
+        self.__lock = Lock()
+        self.__results = []
+        self.__count_files = options.profile
+        if self.__count_files:
+            self.__install_hook()
+        # mind: the file stays open; otherwise, every measurement would count its own opening
+        try:
+            self.__io_fd = os.open('/proc/self/io', os.O_RDONLY)
+        except OSError:
+            self.__io_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @contextmanager
+    def measure(self, name, kind='phase'):
+        """Measure the code within the with-statement"""
+        measurement = Measurement(name, kind)
+        start = self.__snapshot()
+        yield measurement
+        end = self.__snapshot()
+        wall_time = end['wall'] - start['wall']
+        result = OrderedDict([
+            ('name', name),
+            ('kind', kind),
+            ('wall_time_s', round(wall_time, 6)),
+            ('cpu_time_s', round(end['cpu'] - start['cpu'], 6)),
+            ('reports', measurement.reports),
+            ('reports_per_s', round(measurement.reports / wall_time, 1) if wall_time > 0 else None),
+            ('bytes_read', self.__delta(start, end, 'rchar')),
+            ('bytes_written', self.__delta(start, end, 'wchar')),
+            ('disk_bytes_read', self.__delta(start, end, 'read_bytes')),
+            ('disk_bytes_written', self.__delta(start, end, 'write_bytes')),
+            ('files_opened', end['files_opened'] - start['files_opened'] if self.__count_files else None),
+            ('call_stack_parses', end['call_stack_parses'] - start['call_stack_parses']),
+            ('peak_rss_kb', end['peak_rss_kb']),
+            ('workers_peak_rss_kb', end['workers_peak_rss_kb'] or None)
+        ])
+        with self.__lock:
+            self.__results.append(result)
+
+    def save(self):
+        utils.files.makedirs(self.__output_root_path)
+        with self.__lock:
+            data = {
+                'version': 1,
+                'peak_rss_kb': self.__snapshot()['peak_rss_kb'],
+                'measurements': self.__results
+            }
+        with open(os.path.join(self.__output_root_path, self.__file_name), 'w') as metrics_file:
+            json.dump(data, metrics_file, indent=2)
+            metrics_file.close()
+
+    def close(self):
+        """Close /proc/self/io; further measurements go without the I/O numbers"""
+        if self.__io_fd != None:
+            os.close(self.__io_fd)
+            self.__io_fd = None
+
+    def __delta(self, start, end, field):
+        if field in start and field in end:
+            return end[field] - start[field]
+        return None
+
+    def __snapshot(self):
+        snapshot = {
+            'wall': time.perf_counter(),
+            'cpu': time.process_time(),
+            'files_opened': Counters.get('files opened'),
+            'call_stack_parses': Counters.get('call stack parses'),
+            # kilobytes on Linux
+            'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            'workers_peak_rss_kb': Counters.get('workers peak rss kb')
+        }
+        if self.__io_fd != None:
+            io = _read_io(self.__io_fd)
+            for field in self.__io_fields:
+                if field in io:
+                    snapshot[field] = io[field] + Counters.get('workers ' + field)
+        return snapshot
+
+    @classmethod
+    def __install_hook(cls):
+        # mind: audit hooks can never be removed again; install it only once
+        if not cls.__hook_installed:
+            cls.__hook_installed = True
+            sys.addaudithook(cls.__audit)
+
+    @staticmethod
+    def __audit(event, args):
+        if event == 'open':
+            Counters.add('files opened')
+
+class Profiles(object):
+    """Keeps one cProfile profile per name (e.g. per task) and dumps them into .pstats files"""
+
+    __dir_name = 'profiles'
+    __file_ending = '.pstats'
+
+    def __init__(self, options):
+        self.__enabled = options.profile
+        self.__dir_path = os.path.join(options.output_root_path, self.__dir_name)
+        # name.profile
+        self.__profiles = OrderedDict()
+
+    @property
+    def enabled(self):
+        return self.__enabled
+
+    @contextmanager
+    def profile(self, name):
+        """Profile the code within the with-statement; the profile of a name is continued every time"""
+        if not self.__enabled:
+            yield
+            return
+        if not name in self.__profiles:
+            self.__profiles[name] = cProfile.Profile()
+        self.__profiles[name].enable()
+        try:
+            yield
+        finally:
+            self.__profiles[name].disable()
+
+    def wrap(self, name, func):
+        """Returns a function that profiles every call of func; func itself, if profiling is disabled"""
+        if not self.__enabled:
+            return func
+        def profiled_func(*args):
+            with self.profile(name):
+                return func(*args)
+        return profiled_func
+
+    def save(self):
+        if self.__profiles:
+            utils.files.makedirs(self.__dir_path)
+            for name, profile in self.__profiles.items():
+                profile.dump_stats(os.path.join(self.__dir_path, name + self.__file_ending))
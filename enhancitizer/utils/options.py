@@ -24,6 +24,16 @@ class Options(object):
         self.output_root_path = None
         self.logfiles_paths = None
         self.start_clean = False
+        self.context_sidecar = False
+        self.follow = False
+        self.incremental = False
+        self.jobs = 1
+        self.log_file = False
+        self.pipeline = False
+        self.profile = False
+        self.progress = False
+        self.skip_duplicates = False
+        self.stack_cache_mb = 256
         self.show_version = False
 
     def collect(self):
@@ -33,12 +43,44 @@ class Options(object):
         parser.add_argument('--clean',
                             dest='start_clean',
                             action='store_true')
+        parser.add_argument('--context-sidecar',
+                            dest='context_sidecar',
+                            action='store_true')
         parser.add_argument('--debug',
                             dest='print_debug',
                             action='store_true')
+        parser.add_argument('--follow',
+                            dest='follow',
+                            action='store_true')
+        parser.add_argument('--incremental',
+                            dest='incremental',
+                            action='store_true')
+        parser.add_argument('-j', '--jobs',
+                            dest='jobs',
+                            default=1,
+                            type=int)
+        parser.add_argument('--log-file',
+                            dest='log_file',
+                            action='store_true')
         parser.add_argument('--minimal',
                             dest='print_minimal',
                             action='store_true')
+        parser.add_argument('--pipeline',
+                            dest='pipeline',
+                            action='store_true')
+        parser.add_argument('--profile',
+                            dest='profile',
+                            action='store_true')
+        parser.add_argument('--progress',
+                            dest='progress',
+                            action='store_true')
+        parser.add_argument('--skip-duplicates',
+                            dest='skip_duplicates',
+                            action='store_true')
+        parser.add_argument('--stack-cache-mb',
+                            dest='stack_cache_mb',
+                            default=256,
+                            type=int)
         parser.add_argument('-v', '--version',
                             dest='show_version',
                             action='store_true')
@@ -55,9 +97,23 @@ class Options(object):
         self.output_root_path = self.__absolute_path(args.output_root_path)
         self.logfiles_paths = [self.__absolute_path(path) for path in args.logfiles_paths]
         self.start_clean = args.start_clean
+        self.context_sidecar = args.context_sidecar
         self.print_debug = args.print_debug
         self.print_minimal = args.print_minimal
+        self.follow = args.follow
+        self.incremental = args.incremental
+        self.jobs = args.jobs
+        self.log_file = args.log_file
+        self.pipeline = args.pipeline
+        self.profile = args.profile
+        self.progress = args.progress
+        self.skip_duplicates = args.skip_duplicates
+        self.stack_cache_mb = args.stack_cache_mb
         self.show_version = args.show_version
+        if self.follow:
+            # only new reports are looked at while following and duplicates should never make it to the disk
+            self.incremental = True
+            self.skip_duplicates = True
         if self.show_version:
             # TODO: get the version string from __init__.py
             print('\nenhancitizer version 0.0.0\n')
@@ -67,6 +123,12 @@ class Options(object):
         if not os.path.isdir(self.project_root_path):
             print('\nError: PROJECT-ROOT is no valid directory.')
             self.__show_usage()
+        if self.jobs < 1:
+            print('\nError: JOBS has to be at least 1.')
+            self.__show_usage()
+        if self.stack_cache_mb < 0:
+            print('\nError: the stack cache must not be negative.')
+            self.__show_usage()
         if os.path.isfile(self.output_root_path):
             print('\nError: OUTPUT-FOLDER is a file.')
             self.__show_usage()
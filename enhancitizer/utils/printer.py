@@ -8,50 +8,222 @@
 #
 # ------------------------------------------------------------------------------
 
+from contextlib import contextmanager
+import os
+import sys
+from threading import local, RLock, Thread
+import time
+
+class Progress(object):
+    """Counts the processed items of a phase or task; cheap enough to be advanced for every single report"""
+
+    def __init__(self, name, total=None, count_func=None):
+        self.name = name
+        self.total = total
+        self.done = 0
+        self.__count_func = count_func # replaces done, if the items are counted somewhere else
+        self.__start = time.monotonic()
+
+    def advance(self, count=1):
+        self.done += count
+
+    @property
+    def count(self):
+        return self.__count_func() if self.__count_func else self.done
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.__start
+
+    def __str__(self):
+        count = self.count
+        elapsed = self.elapsed
+        rate = count / elapsed if elapsed > 0 else 0
+        text = self.name + ' ' + str(count) + ('/' + str(self.total) if self.total != None else '') + \
+            ' (' + str(round(rate)) + '/s'
+        if self.total != None and rate > 0:
+            text += ', ETA ' + str(round(max(0, self.total - count) / rate)) + ' s'
+        return text + ')'
+
 class Printer(object):
-    """Handles the print function"""
+    """Handles the print function
+
+    All printers share the progress bars and the log file. With --progress, the details of the tasks are only
+    written into the log file and the terminal shows the progress of the running phases instead. Tasks that run
+    concurrently buffer their output (see buffered) so that it can be released in the order of the tasks.
+    """
+
+    __log_file_name = 'enhancitizer.log'
+    __log_batch_size = 10000 # lines
+    __refresh_interval = 0.25 # seconds between two updates of the progress bars on terminals
+    __plain_refresh_interval = 10 # seconds between two progress lines if the output is no terminal
+
+    __lock = RLock()
+    __progresses = []
+    __refresher = None
+    __status_shown = False
+    __log_file = None
+    __log_buffer = []
+    __local = local() # buffer of the current thread (if any)
 
     def __init__(self, options):
         self.__options = options
+        self.__progress_enabled = options.progress
 
     def welcome(self):
         # TODO: add a nice welcome message
         return self.nl()
-    
+
     def settings(self):
         if not self.__options.print_minimal:
-            print('Settings:\n' + \
-                  '  project root:  ' + self.__options.project_root_path + '\n' + \
-                  '  output folder: ' + self.__options.output_root_path + '\n' + \
-                  '  logfiles:')        
+            self.__print('Settings:\n' + \
+                         '  project root:  ' + self.__options.project_root_path + '\n' + \
+                         '  output folder: ' + self.__options.output_root_path + '\n' + \
+                         '  logfiles:')
             for path in self.__options.logfiles_paths:
-                print('    ' + path)
+                self.__print('    ' + path)
             self.nl()
         return self
 
     def nl(self):
-        print()
+        self.__print('')
         return self
 
     def just_print(self, stuff):
         """Only use this for very special purposes"""
-        print(str(stuff))
+        self.__print(str(stuff))
         return self
 
     def task_description(self, description):
-        print(str(description))
+        self.__print(str(description))
         return self
 
     def task_info(self, info):
-        if not self.__options.print_minimal:
-            print('  ' + str(info))
+        shown = not self.__options.print_minimal and not self.__progress_enabled
+        if shown or Printer.__log_file:
+            self.__emit('  ' + str(info), shown)
         return self
 
     def task_info_debug(self, info):
         if self.__options.print_debug:
-            print('  ' + str(info))
+            self.__print('  ' + str(info))
         return self
 
     def bailout(self, message):
-        print('error: ' + str(message))
+        buffer = getattr(Printer.__local, 'buffer', None)
+        if buffer != None:
+            # the output so far explains the error
+            Printer.__local.buffer = None
+            self.release(buffer)
+        self.__print('error: ' + str(message))
+        self.close_log()
         exit()
+
+    def open_log(self):
+        """Start writing all details into the log file in the output folder (if the options ask for it)"""
+        if self.__options.log_file:
+            with Printer.__lock:
+                if not Printer.__log_file:
+                    Printer.__log_file = open(
+                        os.path.join(self.__options.output_root_path, self.__log_file_name), 'w')
+        return self
+
+    def close_log(self):
+        with Printer.__lock:
+            if Printer.__log_file:
+                self.__flush_log()
+                Printer.__log_file.close()
+                Printer.__log_file = None
+        return self
+
+    @classmethod
+    @contextmanager
+    def buffered(cls):
+        """Keep everything that is printed by the current thread within the with-statement; yields the buffer that
+        has to be handed to release() afterwards"""
+        buffer = []
+        cls.__local.buffer = buffer
+        try:
+            yield buffer
+        finally:
+            cls.__local.buffer = None
+
+    def release(self, buffer):
+        """Print (and log) the lines of a buffer in one go"""
+        with Printer.__lock:
+            for line, shown in buffer:
+                self.__emit(line, shown)
+        return self
+
+    def progress(self, name, total=None, count_func=None):
+        """Returns a new Progress; its state is shown until progress_done() is called (with --progress)"""
+        progress = Progress(name, total, count_func)
+        if self.__progress_enabled:
+            with Printer.__lock:
+                Printer.__progresses.append(progress)
+                if not Printer.__refresher:
+                    Printer.__refresher = Thread(target=Printer.__refresh, daemon=True)
+                    Printer.__refresher.start()
+        return progress
+
+    def progress_done(self, progress):
+        if self.__progress_enabled:
+            with Printer.__lock:
+                if progress in Printer.__progresses:
+                    Printer.__progresses.remove(progress)
+                self.__print('  ' + progress.name + ': ' + str(progress.count) + ' in ' +
+                             str(round(progress.elapsed, 1)) + ' s')
+        return self
+
+    def __print(self, line):
+        self.__emit(line, True)
+
+    def __emit(self, line, shown):
+        """Log the line (if there is a log file) and print it (if shown); buffered, if the thread buffers"""
+        buffer = getattr(Printer.__local, 'buffer', None)
+        if buffer != None:
+            buffer.append((line, shown))
+            return
+        with Printer.__lock:
+            if Printer.__log_file:
+                self.__log(line)
+            if shown:
+                self.__write(line)
+
+    def __write(self, line):
+        with Printer.__lock:
+            if Printer.__status_shown:
+                # the status line is redrawn with the next refresh
+                sys.stdout.write('\r\x1b[K')
+                Printer.__status_shown = False
+            print(line)
+
+    def __log(self, line):
+        with Printer.__lock:
+            Printer.__log_buffer.append(line + '\n')
+            if len(Printer.__log_buffer) >= self.__log_batch_size:
+                self.__flush_log()
+
+    @classmethod
+    def __flush_log(cls):
+        cls.__log_file.writelines(cls.__log_buffer)
+        cls.__log_buffer = []
+
+    @classmethod
+    def __refresh(cls):
+        """Shows the progress bars at a fixed rate until there are no more progresses"""
+        tty = sys.stdout.isatty()
+        interval = cls.__refresh_interval if tty else cls.__plain_refresh_interval
+        while True:
+            time.sleep(interval)
+            with cls.__lock:
+                if not cls.__progresses:
+                    cls.__refresher = None
+                    return
+                status = '  ' + ' | '.join(str(progress) for progress in cls.__progresses)
+                if tty:
+                    sys.stdout.write('\r\x1b[K' + status)
+                    sys.stdout.flush()
+                    cls.__status_shown = True
+                else:
+                    print(status)
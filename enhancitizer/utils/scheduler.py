@@ -0,0 +1,61 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class TaskScheduler(object):
+    """Runs tasks in a pool of threads while keeping the order of tasks that depend on each other
+
+    Tasks declare the resources they use in the lists `reads` and `writes`; a task depends on every previous
+    task that writes something it reads or writes, or that reads something it writes. Tasks that do not
+    declare anything (e.g. tasks that have been added by users) depend on all previous tasks and vice versa.
+    """
+
+    def __init__(self, tasks):
+        self.__tasks = list(tasks)
+        # index.indexes of the tasks that have to finish first
+        self.__dependencies = [
+            set(j for j in range(i) if self.__depends(self.__tasks[i], self.__tasks[j]))
+            for i in range(len(self.__tasks))
+        ]
+
+    def run(self, func, jobs):
+        """Call func(task) for every task; one after the other (in order) if there is only one job"""
+        if jobs < 2:
+            for task in self.__tasks:
+                func(task)
+            return
+        finished = set()
+        pending = list(range(len(self.__tasks)))
+        running = {} # future.index
+        with ThreadPoolExecutor(jobs) as executor:
+            while pending or running:
+                for i in [i for i in pending if self.__dependencies[i] <= finished]:
+                    pending.remove(i)
+                    running[executor.submit(func, self.__tasks[i])] = i
+                done, not_done = wait(running.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished.add(running.pop(future))
+                    try:
+                        future.result()
+                    except:
+                        # let the running tasks finish but do not start new ones
+                        wait(running.keys())
+                        raise
+
+    def __depends(self, task, previous_task):
+        if not self.__declares(task) or not self.__declares(previous_task):
+            return True
+        reads, writes = set(task.reads), set(task.writes)
+        previous_reads, previous_writes = set(previous_task.reads), set(previous_task.writes)
+        return bool(previous_writes & (reads | writes) or writes & previous_reads)
+
+    def __declares(self, task):
+        return hasattr(task, 'reads') and hasattr(task, 'writes')
@@ -0,0 +1,256 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from bisect import bisect_right
+import hashlib
+import json
+import os
+import re
+
+import utils.files
+from utils.sources import SourceRepository
+
+class FunctionSignatures(object):
+    """Maps lines of C source files to the full signatures of their enclosing functions; every file is only
+    scanned once and the results are cached on disk (by the hash of the file)"""
+
+    __version = 3
+    __manifest_file_name = 'files.json'
+    __function_pattern = re.compile('^[^=;{}]*\\)$', re.DOTALL)
+    # identifiers in front of parameter lists; '(*' only groups the declarator of a returned function pointer
+    __name_pattern = re.compile('\\b(?P<name>[a-z_]\\w*)\\s*\\((?!\\s*\\*)', re.IGNORECASE)
+    __attribute_pattern = re.compile(
+        '\\b(?:__attribute__\\s*\\(\\((?:[^()]|\\([^()]*\\))*\\)\\)|__declspec\\s*\\([^()]*\\))\\s*')
+    # K&R style: the header names the parameters and their declarations follow (e.g. 'int f(a, b) int a; int b;')
+    __kr_pattern = re.compile(
+        '^(?P<header>[^=;{}]*?\\b[a-z_]\\w*\\s*\\((?P<names>\\s*[a-z_]\\w*(?:\\s*,\\s*[a-z_]\\w*)*\\s*)\\))' +
+        '(?P<params>[^={}]*)$', re.IGNORECASE | re.DOTALL)
+    __kr_param_pattern = re.compile('\\b(?P<name>[a-z_]\\w*)\\s*(?:\\[[^\\]]*\\]\\s*)*$', re.IGNORECASE)
+    __directive_pattern = re.compile('^\\s*#\\s*(?P<directive>\\w*)')
+    __no_function_pattern = re.compile('^(?:typedef|struct|union|enum)\\b', re.IGNORECASE)
+    __linkage_pattern = re.compile('^extern\\s*"C(?:\\+\\+)?"\\s*')
+    __linkage_block_pattern = re.compile('^extern\\s*"C(?:\\+\\+)?"$')
+
+    def __init__(self, cache_dir_path):
+        self.__cache_dir_path = cache_dir_path
+        # src_file_path.(first_line_nums, functions)
+        self.__indexes = {}
+        # src_file_path.(mtime_ns, size, digest) of all files that have cache entries
+        self.__files = self.__load_manifest()
+
+    def find(self, src_file_path, line_num, func_name=None):
+        """Returns the signature of the function that encloses the line or None; if func_name is given, the
+        function has to have this name"""
+        first_line_nums, functions = self.__index(src_file_path)
+        i = bisect_right(first_line_nums, line_num) - 1
+        if i < 0:
+            return None
+        first_line_num, last_line_num, name, signature = functions[i]
+        if line_num > last_line_num or (func_name and func_name != name):
+            return None
+        return signature
+
+    def __index(self, src_file_path):
+        if not src_file_path in self.__indexes:
+            lines = SourceRepository.shared().lines(src_file_path)
+            digest = hashlib.sha1(''.join(lines).encode('utf-8', 'replace')).hexdigest()
+            cache_file_path = os.path.join(self.__cache_dir_path, digest + '.json')
+            functions = self.__load(cache_file_path)
+            if functions == None:
+                functions = self.__scan(lines)
+                self.__store(cache_file_path, functions)
+            stat = os.stat(src_file_path)
+            self.__files[src_file_path] = (stat.st_mtime_ns, stat.st_size, digest)
+            self.__indexes[src_file_path] = ([f[0] for f in functions], functions)
+        return self.__indexes[src_file_path]
+
+    def save(self):
+        """Write the manifest of the cache; the entries of files that have changed or are gone since they have been
+        scanned are dropped"""
+        if not os.path.isdir(self.__cache_dir_path):
+            return
+        files = {}
+        for src_file_path, (mtime_ns, size, digest) in self.__files.items():
+            try:
+                stat = os.stat(src_file_path)
+            except OSError:
+                continue
+            if stat.st_mtime_ns == mtime_ns and stat.st_size == size:
+                files[src_file_path] = (mtime_ns, size, digest)
+        digests = set(digest for mtime_ns, size, digest in files.values())
+        for file_name in os.listdir(self.__cache_dir_path):
+            name, ext = os.path.splitext(file_name)
+            if ext == '.json' and file_name != self.__manifest_file_name and not name in digests:
+                os.remove(os.path.join(self.__cache_dir_path, file_name))
+        self.__files = files
+        self.__write(os.path.join(self.__cache_dir_path, self.__manifest_file_name),
+                     { 'version': self.__version, 'files': files })
+
+    def __load_manifest(self):
+        data = self.__read(os.path.join(self.__cache_dir_path, self.__manifest_file_name))
+        if data.get('version') == self.__version:
+            return dict((path, tuple(entry)) for path, entry in data['files'].items())
+        return {}
+
+    def __load(self, cache_file_path):
+        data = self.__read(cache_file_path)
+        if data.get('version') == self.__version:
+            return [tuple(f) for f in data['functions']]
+        return None
+
+    def __store(self, cache_file_path, functions):
+        utils.files.makedirs(self.__cache_dir_path)
+        self.__write(cache_file_path, { 'version': self.__version, 'functions': functions })
+
+    def __read(self, file_path):
+        data = {}
+        if os.path.isfile(file_path):
+            with open(file_path, 'r') as f:
+                try:
+                    data = json.load(f)
+                except ValueError:
+                    pass
+                f.close()
+        return data
+
+    def __write(self, file_path, data):
+        buffer_file_path = file_path + '.buffer'
+        with open(buffer_file_path, 'w') as buffer_file:
+            json.dump(data, buffer_file)
+            buffer_file.close()
+        os.replace(buffer_file_path, file_path)
+
+    def __scan(self, lines):
+        """Returns (first_line_num, last_line_num, name, signature) of all function definitions"""
+        functions = []
+        depth = 0
+        linkage_blocks = 0 # open extern "C" blocks; they don't count as depth
+        declaration = [] # characters at depth 0 since the last ';', '{' or '}'
+        declaration_line_num = None
+        function = None # first_line_num, name, signature of the current function
+        in_comment = False
+        in_preprocessor = False
+        skipped_conditionals = 0 # only the first branch of #if ... #else ... #endif counts; the others are skipped
+        for line_num, line in enumerate(lines, 1):
+            i = 0
+            if not in_comment and not in_preprocessor and line.lstrip().startswith('#'):
+                in_preprocessor = True
+                directive = self.__directive_pattern.search(line).group('directive')
+                if skipped_conditionals > 0:
+                    if directive in ['if', 'ifdef', 'ifndef']:
+                        skipped_conditionals += 1
+                    elif directive == 'endif':
+                        skipped_conditionals -= 1
+                elif directive in ['else', 'elif', 'elifdef', 'elifndef']:
+                    # e.g. two headers of the same function would open two bodies
+                    skipped_conditionals = 1
+            elif skipped_conditionals > 0 and not in_preprocessor:
+                continue
+            # mind: preprocessor lines are walked through as well; a comment might start on them
+            while i < len(line):
+                c = line[i]
+                if in_comment:
+                    if line.startswith('*/', i):
+                        in_comment = False
+                        i += 1
+                elif line.startswith('/*', i):
+                    in_comment = True
+                    i += 1
+                elif line.startswith('//', i):
+                    break
+                elif c == '"' or c == '\'':
+                    # skip string and char literals
+                    start = i
+                    i += 1
+                    while i < len(line) and line[i] != c:
+                        i += 2 if line[i] == '\\' else 1
+                    if depth == 0 and not in_preprocessor:
+                        declaration.append(line[start:i + 1])
+                elif in_preprocessor:
+                    pass
+                elif c == '{':
+                    if depth == 0:
+                        if self.__linkage_block_pattern.search(''.join(declaration).strip()):
+                            linkage_blocks += 1
+                        else:
+                            function = self.__function(''.join(declaration), declaration_line_num)
+                            depth += 1
+                        declaration, declaration_line_num = [], None
+                    else:
+                        depth += 1
+                elif c == '}':
+                    if i == 0 and depth > 1:
+                        # a '}' in the first column closes the function; lost braces (e.g. in macros) are forgotten
+                        depth = 1
+                    if depth == 0:
+                        linkage_blocks = max(0, linkage_blocks - 1)
+                    else:
+                        depth -= 1
+                        if depth == 0 and function:
+                            functions.append((function[0], line_num, function[1], function[2]))
+                            function = None
+                    if depth == 0:
+                        declaration, declaration_line_num = [], None
+                elif depth == 0:
+                    if c == ';' and not self.__kr_declaration(''.join(declaration)):
+                        declaration, declaration_line_num = [], None
+                    elif c == ';':
+                        declaration.append(c)
+                    else:
+                        if declaration_line_num == None and not c.isspace():
+                            declaration_line_num = line_num
+                        declaration.append(c)
+                i += 1
+            if in_preprocessor:
+                # the directive goes on with escaped line breaks and with comments that span lines
+                in_preprocessor = in_comment or line.rstrip('\n').endswith('\\')
+            elif depth == 0 and declaration:
+                declaration.append(' ')
+        return functions
+
+    def __kr_declaration(self, declaration):
+        """True, if the declaration is the header of a K&R style function, followed by declarations of its
+        parameters (and the last one ends right now)"""
+        search = self.__kr_pattern.search(declaration.strip())
+        if not search or not search.group('params').strip():
+            return False
+        names = [name.strip() for name in search.group('names').split(',')]
+        for param in search.group('params').split(';'):
+            param_search = self.__kr_param_pattern.search(param.strip())
+            if not param_search or not param_search.group('name') in names:
+                return False
+        return True
+
+    def __function(self, declaration, line_num):
+        declaration = self.__linkage_pattern.sub('', declaration.strip())
+        if self.__no_function_pattern.search(declaration):
+            return None
+        if ';' in declaration:
+            # K&R style; the signature is the header only
+            search = self.__kr_pattern.search(declaration)
+            if not search:
+                return None
+            declaration = search.group('header')
+        declaration = self.__attribute_pattern.sub('', declaration).strip()
+        if not self.__function_pattern.search(declaration):
+            return None
+        # the last identifier in front of a parameter list at the top level is the name; functions that return
+        # function pointers (e.g. 'int (*f(int))(int)') only have their name within parentheses
+        name, start = None, 0
+        for search in self.__name_pattern.finditer(declaration):
+            pos = search.start()
+            if declaration.count('(', 0, pos) == declaration.count(')', 0, pos):
+                # anything in front of it (e.g. macros with arguments) is not part of the signature
+                name, start = search.group('name'), declaration.rfind(')', 0, pos) + 1
+            elif not name:
+                name, start = search.group('name'), 0
+        if not name:
+            return None
+        return (line_num, name, ' '.join(declaration[start:].split()))
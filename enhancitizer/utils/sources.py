@@ -0,0 +1,67 @@
+# ------------------------------------------------------------------------------
+#
+# Author:
+#   Armin Hasitzka (enhancitizer@hasitzka.com)
+#
+# Licensed under the MIT license.
+#   See LICENSE in the project root for license information.
+#
+# ------------------------------------------------------------------------------
+
+from collections import OrderedDict
+from threading import RLock
+
+class SourceRepository(object):
+    """Reads every source file only once and keeps its lines for quick lookups; shared by the whole process"""
+
+    __max_size = 64 * 1024 * 1024 # max amount of characters of all kept source files
+
+    __shared = None
+
+    def __init__(self, max_size=None):
+        self.__max_size = max_size if max_size != None else self.__max_size
+        self.__lock = RLock()
+        self.__size = 0
+        # file_path.lines
+        self.__files = OrderedDict()
+
+    @classmethod
+    def shared(cls):
+        """Returns the repository of this process"""
+        if not cls.__shared:
+            cls.__shared = cls()
+        return cls.__shared
+
+    def lines(self, file_path):
+        """Returns all lines of the file (incl. line endings); index 0 = line 1"""
+        with self.__lock:
+            lines = self.__files.get(file_path)
+            if lines != None:
+                self.__files.move_to_end(file_path)
+                return lines
+        lines = self.__read(file_path)
+        with self.__lock:
+            if not file_path in self.__files:
+                self.__files[file_path] = lines
+                self.__size += sum(len(line) for line in lines)
+                # the most recent file always stays
+                while self.__size > self.__max_size and len(self.__files) > 1:
+                    evicted_file_path, evicted_lines = self.__files.popitem(last=False)
+                    self.__size -= sum(len(line) for line in evicted_lines)
+        return lines
+
+    def line(self, file_path, num):
+        """Returns the line with the number num (starting with 1) or None"""
+        lines = self.lines(file_path)
+        return lines[num - 1] if 0 < num <= len(lines) else None
+
+    def __read(self, file_path):
+        with open(file_path, 'rb') as src_file:
+            data = src_file.read()
+            src_file.close()
+        # behave like a file that is opened with universal newlines
+        text = data.decode('utf-8', 'replace').replace('\r\n', '\n').replace('\r', '\n')
+        lines = text.split('\n')
+        if lines[-1]:
+            return [line + '\n' for line in lines[:-1]] + [lines[-1]]
+        return [line + '\n' for line in lines[:-1]]
@@ -9,6 +9,7 @@
 # ------------------------------------------------------------------------------
 
 from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 class StopWatch(object):
@@ -32,3 +33,35 @@ class StopWatch(object):
             t *= 1000
             u += 1
         return str(round(t)) + ' ' + self.__units[u]
+
+class Workers(object):
+    """Runs functions in a pool of threads, or right away if there is only one job; meant for file I/O"""
+
+    def __init__(self, jobs):
+        self.__executor = None if jobs < 2 else ThreadPoolExecutor(jobs)
+        self.__futures = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.wait()
+
+    def submit(self, func, *args):
+        if self.__executor:
+            self.__futures.append(self.__executor.submit(func, *args))
+        else:
+            func(*args)
+        return self
+
+    def wait(self):
+        """Wait for all functions; raises the first exception of them"""
+        if self.__executor:
+            futures = self.__futures
+            self.__futures = []
+            try:
+                for future in futures:
+                    future.result()
+            finally:
+                self.__executor.shutdown()
+                self.__executor = None